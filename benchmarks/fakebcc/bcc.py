@@ -0,0 +1,73 @@
+"""Stand-in for the bcc module, for running generated scripts without a
+kernel. Nothing is compiled or attached: attach calls are recorded on the
+BPF object, and perf_buffer_poll calls the module level `poll` hook,
+which load.py replaces with its event driver."""
+import time
+
+instances = []
+
+
+class PerfType:
+    HARDWARE = 0
+    SOFTWARE = 1
+
+
+class PerfSWConfig:
+    CPU_CLOCK = 0
+
+
+class Zero:
+    """Map value whose every field reads 0, e.g. dropped counters"""
+
+    def __getattr__(self, name):
+        return 0
+
+
+class Table(dict):
+    def __init__(self, name: str, percpu: bool = False):
+        super().__init__()
+        self.name = name
+        self.percpu = percpu
+        self.callback = None
+
+    def __missing__(self, key):
+        return [Zero()] if self.percpu else Zero()
+
+    def open_perf_buffer(self, callback, **kwargs):
+        self.callback = callback
+
+    def walk(self, stack_id):
+        return iter(())
+
+
+class BPF:
+    def __init__(self, text: str = "", **kwargs):
+        self.text = text
+        self.attached: [(str, dict)] = []
+        self.tables: {str: Table} = {}
+        self.funcs = {}  # nothing is loaded, so no program fds
+        instances.append(self)
+
+    def attach_uprobe(self, **kwargs):
+        self.attached.append(("uprobe", kwargs))
+
+    def attach_perf_event(self, **kwargs):
+        self.attached.append(("perf_event", kwargs))
+
+    def __getitem__(self, name: str) -> Table:
+        if name not in self.tables:
+            percpu = f"BPF_PERCPU_ARRAY({name}," in self.text
+            self.tables[name] = Table(name, percpu)
+        return self.tables[name]
+
+    get_table = __getitem__
+
+    def sym(self, addr, pid, **kwargs) -> bytes:
+        return b"[unknown]"
+
+    def perf_buffer_poll(self, timeout: int = -1):
+        poll(self)
+
+
+def poll(bpf: BPF):
+    time.sleep(0.1)
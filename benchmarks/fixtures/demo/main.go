@@ -0,0 +1,41 @@
+package main
+
+import (
+	"fmt"
+	"time"
+)
+
+type Item struct {
+	ID   int64
+	Name string
+}
+
+type Batch struct {
+	Items []Item
+	N     int64
+}
+
+var counter struct {
+	hits  int64
+	total int64
+}
+
+//go:noinline
+func handle(b *Batch, path string) int64 {
+	counter.hits++
+	s := int64(0)
+	for _, it := range b.Items {
+		s += it.ID
+	}
+	return s + int64(len(path))
+}
+
+func small(x int64) int64 { return x * 2 }
+
+func main() {
+	b := &Batch{Items: []Item{{1, "a"}, {2, "b"}}, N: 2}
+	for {
+		fmt.Println(handle(b, "hello"), small(counter.hits))
+		time.Sleep(time.Second)
+	}
+}
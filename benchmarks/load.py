@@ -0,0 +1,222 @@
+"""Drive a generated script with synthetic events, no kernel needed.
+
+    rrr -t ./main -p '...' -o trace.bcc.py
+    python benchmarks/load.py trace.bcc.py -r 10000 -d 5
+
+The script runs against the stand-in bcc module under fakebcc/. Records
+are synthesized from each probe's ctypes Data layout and fed through its
+callbackN at the requested rate, or as fast as possible with -r 0. The
+report has the throughput reached and the latency of each callback,
+which is mostly the script block.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import ctypes
+import statistics
+import contextlib
+
+import click
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakebcc")
+)
+
+import bcc  # noqa: E402
+
+BATCH = 1000  # max events per probe per poll
+LETTERS = b"abcdefghijklmnopqrstuvwxyz"
+
+
+def fill(obj, rnd: random.Random):
+    for name, t in obj._fields_:
+        value = synthesize(t, rnd)
+        if issubclass(t, ctypes.Array) and t._type_ is ctypes.c_char:
+            value = value.value  # char array fields take bytes
+        setattr(obj, name, value)
+
+
+def synthesize(t, rnd: random.Random):
+    if issubclass(t, ctypes.Structure):
+        value = t()
+        fill(value, rnd)
+        return value
+    if issubclass(t, ctypes.Array):
+        value = t()
+        if t._type_ is ctypes.c_char:
+            n = rnd.randint(1, t._length_)
+            value.value = bytes(rnd.choices(LETTERS, k=n))
+        else:
+            for i in range(t._length_):
+                value[i] = synthesize(t._type_, rnd)
+        return value
+    if t in (ctypes.c_float, ctypes.c_double):
+        return rnd.random() * 1000
+    if t is ctypes.c_bool:
+        return rnd.random() < 0.5
+    return rnd.randint(0, 1023)
+
+
+class Probe:
+    def __init__(self, idx: int, data_cls, callback, pool: int, seed: int):
+        rnd = random.Random(seed)
+        self.idx = idx
+        self.callback = callback
+        self.size = ctypes.sizeof(data_cls)
+        self.records = []
+        for _ in range(pool):
+            data = data_cls()
+            fill(data, rnd)
+            self.records.append(data)
+        self.sent = 0
+        self.errors = 0
+        self.error = ""
+        self.latencies: [int] = []
+
+    def send(self, n: int):
+        for _ in range(n):
+            data = self.records[self.sent % len(self.records)]
+            start = time.perf_counter_ns()
+            try:
+                self.callback(0, ctypes.addressof(data), self.size)
+            except Exception as e:  # bcc prints and carries on
+                self.errors += 1
+                self.error = self.error or repr(e)
+            self.latencies.append(time.perf_counter_ns() - start)
+            self.sent += 1
+
+
+class Driver:
+    def __init__(self, namespace: dict, rate: int, duration: float, pool: int):
+        self.namespace = namespace
+        self.rate = rate
+        self.duration = duration
+        self.pool = pool
+        self.probes: [Probe] = []
+        self.start = self.elapsed = None
+
+    def setup(self, bpf: bcc.BPF):
+        for name, table in sorted(bpf.tables.items()):
+            if not name.startswith("events") or not table.callback:
+                continue
+            idx = int(name.removeprefix("events"))
+            self.probes.append(
+                Probe(
+                    idx,
+                    self.namespace[f"Data{idx}"],
+                    table.callback,
+                    self.pool,
+                    idx,
+                )
+            )
+        self.start = time.perf_counter()
+
+    def poll(self, bpf: bcc.BPF):
+        if self.start is None:
+            self.setup(bpf)
+        now = time.perf_counter()
+        self.elapsed = now - self.start
+        if self.elapsed >= self.duration:
+            raise KeyboardInterrupt
+
+        idle = True
+        for probe in self.probes:
+            due = (
+                int(self.elapsed * self.rate) - probe.sent
+                if self.rate
+                else BATCH
+            )
+            if due > 0:
+                probe.send(min(due, BATCH))
+                idle = False
+        if idle:  # with -r 0 only scripts without probes idle
+            wait = 1 / self.rate if self.rate else self.duration
+            time.sleep(min(wait, self.duration - self.elapsed))
+
+    def report(self) -> [dict]:
+        results = []
+        for probe in self.probes:
+            latencies = sorted(probe.latencies) or [0]
+            results.append(
+                {
+                    "probe": probe.idx,
+                    "events": probe.sent,
+                    "rate": probe.sent / self.elapsed if self.elapsed else 0,
+                    "target_rate": self.rate,
+                    "p50_us": latencies[len(latencies) // 2] / 1000,
+                    "p99_us": latencies[len(latencies) * 99 // 100] / 1000,
+                    "max_us": latencies[-1] / 1000,
+                    "mean_us": statistics.mean(latencies) / 1000,
+                    "errors": probe.errors,
+                    "error": probe.error,
+                }
+            )
+        return results
+
+
+def run(script: str, rate: int, duration: float, pool: int, quiet: bool):
+    with open(script) as f:
+        code = compile(f.read(), script, "exec")
+    namespace = {"__name__": "__main__", "__file__": script}
+    driver = Driver(namespace, rate, duration, pool)
+    bcc.poll = driver.poll
+    bcc.instances.clear()
+
+    output = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        try:
+            exec(code, namespace)
+        except KeyboardInterrupt:
+            pass
+    return bcc.instances, driver.report()
+
+
+@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.argument("script")
+@click.option(
+    "-r",
+    "--rate",
+    default=10000,
+    show_default=True,
+    help="events per second per probe, 0 for as fast as possible",
+)
+@click.option("-d", "--duration", default=5.0, show_default=True)
+@click.option(
+    "--pool",
+    default=256,
+    show_default=True,
+    help="distinct synthetic records per probe",
+)
+@click.option("-v", "--verbose", is_flag=True, help="show script output")
+@click.option("-o", "--output", help="write json results to the file")
+def main(script, rate, duration, pool, verbose, output):
+    instances, results = run(script, rate, duration, pool, not verbose)
+    for bpf in instances:
+        for kind, attach in bpf.attached:
+            where = (
+                hex(attach["addr"])
+                if "addr" in attach
+                else f"every {attach.get('sample_period')}ns"
+            )
+            print(f"attach_{kind} {attach['fn_name']} {where}")
+
+    for r in results:
+        print(
+            f"probe{r['probe']:<4}{r['events']:>10} events"
+            f"{r['rate']:>12.0f}/s  p50 {r['p50_us']:.1f}us"
+            f"  p99 {r['p99_us']:.1f}us  max {r['max_us']:.1f}us"
+        )
+        if r["errors"]:
+            print(f"  {r['errors']} errors, first: {r['error']}")
+        if rate and r["rate"] < rate * 0.95:
+            print(f"  fell behind the target rate of {rate}/s")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"script": script, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Benchmark elf resolution and script generation.
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py -b results.json  # compare with a baseline
+
+Synthetic binaries of several sizes are fed into the objdump cache, so
+the numbers cover the Python side only; the demo Go binary under
+fixtures/ is built and rendered from scratch when `go` is available.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import statistics
+import subprocess
+import tempfile
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranranru import bcc  # noqa: E402
+from ranranru import elf  # noqa: E402
+from ranranru import program  # noqa: E402
+from ranranru.__version__ import __version__  # noqa: E402
+from ranranru.elf import utils  # noqa: E402
+
+import synthetic  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+DEMO_PROGRAM = (
+    "main.handle; p=$peek(path.str(char16)), pn=$peek(path.len(int64)), "
+    "n=$peek(b.N(int64)); {print(p[:pn], n)};"
+)
+
+
+def measure(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "repeat": repeat,
+    }
+
+
+def gen_program(b: synthetic.Binary, probes: int) -> str:
+    r = []
+    for k in range(probes):
+        i = (k * 7919 + b.n // 2) % b.n
+        r.append(
+            f"{b.function(i)}; id=$peek(req.id(int64)), "
+            f"s=$peek(req.name.str(char16)), sn=$peek(req.name.len(int64)), "
+            f"n=$peek(n(int64)); {{print(id, s[:sn], n)}};"
+        )
+    return "\n".join(r)
+
+
+def bench_synthetic(sizes: [int], probe_counts: [int], repeat: int) -> [dict]:
+    results = []
+    for size in sizes:
+        b = synthetic.generate(size)
+        filename = f"synthetic-{size}"
+        for flags, lines in b.dumps.items():
+            utils._cache[(filename, flags)] = lines
+        interpreter = elf.Interpreter(filename)
+
+        last = size - 1  # worst case for linear scans
+        addr = b.address(last)
+        cases = {
+            "find_address_by_function_name": lambda: (
+                interpreter.find_address_by_function_name(b.function(last))
+            ),
+            "find_address_by_filename_lineno": lambda: (
+                interpreter.find_address_by_filename_lineno(
+                    b.filename(last), b.lineno(last)
+                )
+            ),
+            "parse_var": lambda: interpreter.parse_var(addr, "req"),
+            "find_expr_location": lambda: interpreter.find_expr_location(
+                addr, "req", ["name", "len"]
+            ),
+        }
+        for name, func in cases.items():
+            results.append(
+                {"case": name, "size": size, **measure(func, repeat)}
+            )
+
+        for probes in probe_counts:
+            uprobes = program.parse(gen_program(b, probes))
+            extra_vars = {"real_target": filename}
+            results.append(
+                {
+                    "case": "render",
+                    "size": size,
+                    "probes": probes,
+                    **measure(
+                        lambda: bcc.render(uprobes, interpreter, extra_vars),
+                        repeat,
+                    ),
+                }
+            )
+        interpreter.close()
+    return results
+
+
+def bench_demo(repeat: int) -> [dict]:
+    if not shutil.which("go"):
+        return []
+    with tempfile.TemporaryDirectory() as d:
+        binary = os.path.join(d, "demo")
+        subprocess.run(
+            ["go", "build", "-o", binary, "."],
+            cwd=os.path.join(FIXTURES, "demo"),
+            check=True,
+        )
+        uprobes = program.parse(DEMO_PROGRAM)
+        extra_vars = {"real_target": binary}
+
+        def cold():
+            elf.Interpreter(binary).close()
+            bcc.render(uprobes, elf.Interpreter(binary), extra_vars)
+
+        return [
+            {"case": "demo_render_cold", **measure(cold, repeat)},
+            {
+                "case": "demo_render_warm",
+                **measure(
+                    lambda: bcc.render(
+                        uprobes, elf.Interpreter(binary), extra_vars
+                    ),
+                    repeat,
+                ),
+            },
+        ]
+
+
+def key(result: dict) -> str:
+    return "/".join(
+        str(result[k]) for k in ("case", "size", "probes") if k in result
+    )
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> [str]:
+    old = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        if key(r) not in old:
+            continue
+        ratio = r["median"] / old[key(r)]["median"]
+        if ratio > threshold:
+            regressions.append(f"{key(r)}: {ratio:.2f}x slower")
+    return regressions
+
+
+@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.option(
+    "-s",
+    "--sizes",
+    default="100,1000,10000",
+    show_default=True,
+    help="number of functions in synthetic binaries",
+)
+@click.option(
+    "-p",
+    "--probes",
+    default="1,8,32",
+    show_default=True,
+    help="number of probes rendered per synthetic binary",
+)
+@click.option("-r", "--repeat", default=5, show_default=True)
+@click.option("-o", "--output", help="write json results to the file")
+@click.option("-b", "--baseline", help="json results to compare against")
+@click.option(
+    "-t",
+    "--threshold",
+    default=1.2,
+    show_default=True,
+    help="median slowdown ratio reported as a regression",
+)
+def main(sizes, probes, repeat, output, baseline, threshold):
+    results = bench_synthetic(
+        [int(s) for s in sizes.split(",")],
+        [int(p) for p in probes.split(",")],
+        repeat,
+    ) + bench_demo(repeat)
+    current = {
+        "meta": {
+            "ranranru": __version__,
+            "python": platform.python_version(),
+            "objdump": subprocess.run(
+                ["objdump", "--version"], capture_output=True, text=True
+            ).stdout.split("\n")[0],
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+    for r in results:
+        print(f"{key(r):<48}{r['median'] * 1000:>10.2f} ms")
+    if output:
+        with open(output, "w") as f:
+            json.dump(current, f, indent=2)
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(json.load(f), current, threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
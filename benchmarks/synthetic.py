@@ -0,0 +1,221 @@
+"""Synthetic objdump dumps of a Go binary, scaled by the number of functions.
+
+Every function pkg{p}.fn{i} takes `req *pkg.Request{t}` in rax and `n int`
+in rbx, and keeps a local `buf` on the frame. The dumps mirror the objdump
+output the elf package parses, so they can be fed straight into its cache.
+"""
+import dataclasses
+
+TEXT = 0x401000
+FUNC_SIZE = 0x100  # distance between functions
+FUNC_LEN = 0xE0  # code length, the rest is padding
+LOC_BASE = 0xE0000000
+FUNCS_PER_FILE = 20
+PACKAGES = 16
+TYPES = 32
+
+
+@dataclasses.dataclass
+class Binary:
+    n: int
+    dumps: {str: [bytes]} = dataclasses.field(default_factory=dict)
+
+    def function(self, i: int) -> str:
+        return f"pkg{i % PACKAGES}.fn{i}"
+
+    def address(self, i: int) -> str:
+        return f"0x{TEXT + i * FUNC_SIZE:016x}"
+
+    def filename(self, i: int) -> str:
+        f = i // FUNCS_PER_FILE
+        return f"pkg{f}/file{f}.go"
+
+    def lineno(self, i: int) -> str:
+        return str(10 + (i % FUNCS_PER_FILE) * 10 + 1)
+
+
+class Offsets:
+    def __init__(self, start: int):
+        self.value = start
+
+    def __call__(self) -> str:
+        self.value += 0x7
+        return f"{self.value:x}"
+
+
+def header(section: str) -> [str]:
+    return [
+        "",
+        "bench:     file format elf64-x86-64",
+        "",
+        f"Contents of the {section} section:",
+        "",
+    ]
+
+
+def gen_symbol_table(b: Binary) -> [str]:
+    lines = ["", "bench:     file format elf64-x86-64", "", "SYMBOL TABLE:"]
+    for i in range(b.n):
+        lines.append(
+            f"{TEXT + i * FUNC_SIZE:016x} g     F .text\t"
+            f"{FUNC_LEN:016x} {b.function(i)}"
+        )
+    return lines
+
+
+def gen_debug_line(b: Binary) -> [str]:
+    lines = header(".debug_line")
+    for i in range(b.n):
+        low_pc, f = TEXT + i * FUNC_SIZE, i // FUNCS_PER_FILE
+        lines.append(f"/src/{b.filename(i)}:")
+        base = "file{}.go".format(f)
+        lineno = int(b.lineno(i))
+        for j in range(4):
+            lines.append(
+                f"{base:<40}{lineno + j:>10}{'':12}0x{low_pc + j * 8:x}"
+                f"{'':15}x"
+            )
+        lines.append(f"{base:<40}{'-':>10}{'':12}0x{low_pc + FUNC_LEN:x}")
+        lines.append("")
+    return lines
+
+
+def gen_debug_frame(b: Binary) -> [str]:
+    lines = header(".debug_frame")
+    lines.append('00000000 0000000000000010 ffffffff CIE "" cf=1 df=-4 ra=16')
+    lines.append("   LOC           CFA      ra    ")
+    lines.append("")
+    for i in range(b.n):
+        low_pc = TEXT + i * FUNC_SIZE
+        lines.append(
+            f"{i * 0x20:08x} 0000000000000024 00000000 FDE cie=00000000 "
+            f"pc={low_pc:016x}..{low_pc + FUNC_LEN:016x}"
+        )
+        lines.append("   LOC           CFA      ra    ")
+        for off, cfa in ((0, "rsp+8"), (0x10, "rsp+48"), (0xD0, "rsp+8")):
+            lines.append(f"{low_pc + off:016x} {cfa:<8} c-8   ")
+        lines.append("")
+    return lines
+
+
+def gen_debug_loc(b: Binary) -> [str]:
+    lines = header(".debug_loc")
+    lines.append("    Offset   Begin            End              Expression")
+    for i in range(b.n):
+        low_pc, loc = TEXT + i * FUNC_SIZE, LOC_BASE + i * 0x80
+        for k, reg in enumerate(("DW_OP_reg0 (rax)", "DW_OP_reg3 (rbx)")):
+            off = loc + k * 0x40
+            lines += [
+                f"    {off:08x} ffffffffffffffff {low_pc:016x} (base address)",  # noqa
+                f"    {off + 0x10:08x} {low_pc:016x} {low_pc + 0x40:016x} ({reg})",  # noqa
+                f"    {off + 0x23:08x} <End of list>",
+            ]
+    return lines
+
+
+def gen_debug_info(b: Binary) -> [str]:  # noqa
+    offset = Offsets(0x10)
+    lines = header(".debug_info")
+
+    # types live after the subprograms so find_type scans the whole unit
+    type_start = 0x10 + b.n * 0x7 * 32
+    types = Offsets(type_start)
+    int_t, string_t = types(), None
+    type_lines = [
+        f" <1><{int_t}>: Abbrev Number: 29 (DW_TAG_base_type)",
+        f"    <{types()}>   DW_AT_name        : int",
+        f"    <{types()}>   DW_AT_byte_size   : 8",
+    ]
+    string_t = types()
+    type_lines += [
+        f" <1><{string_t}>: Abbrev Number: 39 (DW_TAG_structure_type)",
+        f"    <{types()}>   DW_AT_name        : string",
+        f"    <{types()}>   DW_AT_byte_size   : 16",
+    ]
+    for name, loc, t in (("str", 0, int_t), ("len", 8, int_t)):
+        type_lines += [
+            f" <2><{types()}>: Abbrev Number: 24 (DW_TAG_member)",
+            f"    <{types()}>   DW_AT_name        : {name}",
+            f"    <{types()}>   DW_AT_data_member_location: {loc}",
+            f"    <{types()}>   DW_AT_type        : <0x{t}>",
+        ]
+    type_lines.append(f" <2><{types()}>: Abbrev Number: 0")
+
+    pointers = []
+    for t in range(TYPES):
+        struct_t, pointer_t = types(), types()
+        pointers.append(pointer_t)
+        type_lines += [
+            f" <1><{pointer_t}>: Abbrev Number: 35 (DW_TAG_pointer_type)",
+            f"    <{types()}>   DW_AT_name        : *pkg.Request{t}",
+            f"    <{types()}>   DW_AT_type        : <0x{struct_t}>",
+            f" <1><{struct_t}>: Abbrev Number: 39 (DW_TAG_structure_type)",
+            f"    <{types()}>   DW_AT_name        : pkg.Request{t}",
+            f"    <{types()}>   DW_AT_byte_size   : 40",
+        ]
+        for name, loc, mt in (
+            ("id", 0, int_t),
+            ("name", 8, string_t),
+            ("next", 24, pointer_t),
+            ("count", 32, int_t),
+        ):
+            type_lines += [
+                f" <2><{types()}>: Abbrev Number: 24 (DW_TAG_member)",
+                f"    <{types()}>   DW_AT_name        : {name}",
+                f"    <{types()}>   DW_AT_data_member_location: {loc}",
+                f"    <{types()}>   DW_AT_type        : <0x{mt}>",
+            ]
+        type_lines.append(f" <2><{types()}>: Abbrev Number: 0")
+
+    for i in range(b.n):
+        if i % FUNCS_PER_FILE == 0:
+            lines += [
+                f"  Compilation Unit @ offset 0x{offset()}:",
+                "   Version:       4",
+                f" <0><{offset()}>: Abbrev Number: 1 (DW_TAG_compile_unit)",
+                f"    <{offset()}>   DW_AT_name        : pkg{i}",
+            ]
+        low_pc, loc = TEXT + i * FUNC_SIZE, LOC_BASE + i * 0x80
+        lines += [
+            f" <1><{offset()}>: Abbrev Number: 3 (DW_TAG_subprogram)",
+            f"    <{offset()}>   DW_AT_name        : {b.function(i)}",
+            f"    <{offset()}>   DW_AT_low_pc      : 0x{low_pc:x}",
+            f"    <{offset()}>   DW_AT_high_pc     : 0x{low_pc + FUNC_LEN:x}",
+            f"    <{offset()}>   DW_AT_frame_base  : 1 byte block: 9c \t(DW_OP_call_frame_cfa)",  # noqa
+        ]
+        for name, t, location in (
+            ("req", pointers[i % TYPES], f"0x{loc:x} (location list)"),
+            ("n", int_t, f"0x{loc + 0x40:x} (location list)"),
+        ):
+            lines += [
+                f" <2><{offset()}>: Abbrev Number: 18 (DW_TAG_formal_parameter)",  # noqa
+                f"    <{offset()}>   DW_AT_name        : {name}",
+                f"    <{offset()}>   DW_AT_variable_parameter: 0",
+                f"    <{offset()}>   DW_AT_type        : <0x{t}>",
+                f"    <{offset()}>   DW_AT_location    : {location}",
+            ]
+        lines += [
+            f" <2><{offset()}>: Abbrev Number: 13 (DW_TAG_variable)",
+            f"    <{offset()}>   DW_AT_name        : buf",
+            f"    <{offset()}>   DW_AT_type        : <0x{string_t}>",
+            f"    <{offset()}>   DW_AT_location    : 2 byte block: 91 8 \t(DW_OP_fbreg: 8)",  # noqa
+            f" <2><{offset()}>: Abbrev Number: 0",
+        ]
+    assert offset.value < type_start, "subprograms overlap types"
+    return lines + ["  Compilation Unit @ offset 0x0:"] + type_lines
+
+
+GENERATORS = {
+    "t": gen_symbol_table,
+    "WL": gen_debug_line,
+    "Wi": gen_debug_info,
+    "Wo": gen_debug_loc,
+    "-dwarf=frames-interp": gen_debug_frame,
+}
+
+
+def generate(n: int) -> Binary:
+    b = Binary(n)
+    for flags, gen in GENERATORS.items():
+        b.dumps[flags] = [line.strip().encode() for line in gen(b)]
+    return b
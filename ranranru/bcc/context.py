@@ -1,8 +1,13 @@
+import ast
+import sys
+import textwrap
 import functools
 import dataclasses
 
 from .. import elf
 from .. import program
+from .. import timings
+from .. import capture
 
 
 @dataclasses.dataclass
@@ -12,29 +17,47 @@ class UprobeContext:
     address: str = ""
 
     c_global: str = ""
+    c_guard: str = ""
     c_data: str = ""
     c_callback: str = ""
+    c_submit: str = ""  # condition for sending the event
 
     py_data: str = ""
     py_callback: str = ""
+    py_report: str = ""
+
+    # every address the uprobe attaches to, e.g. inline sites
+    sites: [dict] = dataclasses.field(default_factory=list)
+    # tick period of timer probes, which attach to no address
+    timer_ns: int = 0
+    # probes only recording span starts have nothing to send
+    submit: bool = True
 
     def __post_init__(self):
         self.tracee_binary = self.tracee_binary.strip()
         self.address = self.address.strip()
         self.c_global = self.c_global.strip()
+        self.c_guard = self.c_guard.strip()
         self.c_data = self.c_data.strip()
         self.c_callback = self.c_callback.strip()
+        self.c_submit = self.c_submit.strip()
         self.py_data = self.py_data.strip()
         self.py_callback = self.py_callback.strip()
+        self.py_report = self.py_report.strip()
 
     def merge(self, other: "UprobeContext"):
         self.c_global = f"{self.c_global}\n{other.c_global}".rstrip()
+        self.c_guard = f"{self.c_guard}\n{other.c_guard}".rstrip()
         self.c_data = f"{self.c_data}\n{other.c_data}".rstrip()
         self.c_callback = f"{self.c_callback}\n{other.c_callback}".rstrip()
+        self.c_submit = " && ".join(
+            c for c in (self.c_submit, other.c_submit) if c
+        )
         self.py_data = f"{self.py_data}\n{other.py_data}".rstrip()
         self.py_callback = (
             f"{self.py_callback}\n{other.py_callback}".rstrip()
         )  # noqa
+        self.py_report = f"{self.py_report}\n{other.py_report}".rstrip()
 
 
 class Manager:
@@ -51,18 +74,235 @@ class Manager:
     def dump_context(self) -> str:
         ctxes = []
         for uprobe in self.uprobes:
-            ctx = UprobeContext(
-                idx=uprobe.idx,
-                tracee_binary=self.extra_ctx["real_target"],
-                address=uprobe.address.interpret(self.elf_interpreter),
-            )
+            with timings.scope(f"uprobe{uprobe.idx}"):
+                ctxes.append(dataclasses.asdict(self.dump_uprobe(uprobe)))
+        return {
+            "uprobes": ctxes,
+            **self.dump_filter(),
+            **self.dump_spans(),
+            **self.dump_stats(),
+            **self.dump_capture(ctxes),
+        }
+
+    def dump_capture(self, ctxes: [dict]) -> dict:
+        if not self.extra_ctx.get("capture"):
+            return {"capture": ""}
+        return {
+            "capture": self.extra_ctx["capture"],
+            "capture_header": repr(capture.dump_header(ctxes)),
+            "capture_record": repr(capture.RECORD.format),
+        }
+
+    def dump_spans(self) -> dict:
+        spans = {"start": set(), "elapsed": set()}
+        for uprobe in self.uprobes:
             for define in uprobe.defines:
-                ctx.merge(
-                    convert(define, self.elf_interpreter, ctx, self.extra_ctx)
+                if isinstance(define, program.StartDefine):
+                    spans["start"].add(define.name)
+                elif isinstance(define, program.ElapsedDefine):
+                    spans["elapsed"].add(define.name)
+        for name in spans["elapsed"] - spans["start"]:
+            raise ValueError(f"span never started: {name}")
+        return {
+            "spans": sorted(spans["start"]),
+            "span_entries": int(self.extra_ctx.get("span_entries", 10240)),
+        }
+
+    def dump_stats(self) -> dict:
+        if "stats" not in self.extra_ctx and not self.extra_ctx.get(
+            "stats_file"
+        ):
+            return {"stats": 0, "stats_file": ""}
+        interval = float(self.extra_ctx.get("stats") or 5)
+        if interval <= 0:
+            raise ValueError(f"invalid stats interval: {interval}")
+        return {
+            "stats": interval,
+            "stats_file": self.extra_ctx.get("stats_file", ""),
+        }
+
+    def dump_filter(self) -> dict:
+        filters = {
+            "attach_pids": split_list(self.extra_ctx.get("attach_pids")),
+            "filter_pids": None,
+            "filter_cgroups": None,
+            "filter_file": self.extra_ctx.get("filter_file", ""),
+        }
+        for key in ("filter_pids", "filter_cgroups"):
+            if key in self.extra_ctx:
+                filters[key] = split_list(self.extra_ctx[key])
+        for pid in filters["attach_pids"] + (filters["filter_pids"] or []):
+            if not pid.isdigit():
+                raise ValueError(f"invalid pid: {pid}")
+        if filters["filter_file"] and (
+            filters["filter_pids"] is None
+            and filters["filter_cgroups"] is None
+        ):
+            raise ValueError(
+                "filter_file requires filter_pids or filter_cgroups"
+            )
+        return filters
+
+    def dump_uprobe(self, uprobe: program.Uprobe) -> UprobeContext:
+        with timings.phase("address"):
+            addresses = uprobe.address.interpret_all(self.elf_interpreter)
+
+        names = script_names(uprobe.script)
+        ctx = error = None
+        for address in addresses:
+            try:
+                site, decodes = self.dump_site(uprobe, address, names)
+            except ValueError as e:
+                if uprobe.address.type() != "inline":
+                    raise
+                # variables are often optimized out at some inline sites
+                print(f"skip inline site {address}: {e}", file=sys.stderr)
+                error = e
+                continue
+            # sites only differ in where the defines are read from
+            if ctx is None:
+                ctx = site
+                ctx.py_callback = lazy_callback(decodes, uprobe.script, names)
+            ctx.sites.append(
+                {"address": site.address, "c_callback": site.c_callback}
+            )
+        if ctx is None:
+            raise error
+        ctx.submit = bool(uprobe.script) or not all(
+            isinstance(define, program.StartDefine) and not define.varname
+            for define in uprobe.defines
+            # unnamed guards only drop hits, they have nothing to send
+            if define.varname or not isinstance(define, program.GuardDefine)
+        )
+        return ctx
+
+    def dump_site(
+        self, uprobe: program.Uprobe, address: str, names: {str}
+    ) -> (UprobeContext, [(str, str)]):
+        """The site and (varname, py_callback) of its defines; values the
+        script never uses are not read, names None keeps them all"""
+        site = UprobeContext(
+            idx=uprobe.idx,
+            tracee_binary=self.extra_ctx["real_target"],
+            address=address,
+        )
+        if uprobe.address.type() == "timer":
+            site.merge(timer_context(uprobe, self.extra_ctx))
+            site.timer_ns = timer_tick_ns(uprobe.address.timer_ns)
+        decodes = []
+        for define in uprobe.defines:
+            unused = (
+                names is not None
+                and define.varname
+                and define.varname not in names
+            )
+            if unused and isinstance(define, READERS):
+                continue  # not even resolved, it may not exist at the site
+            with timings.scope(f"define{define.idx}"), timings.phase(
+                "convert"
+            ):
+                define_ctx = convert(
+                    define, self.elf_interpreter, site, self.extra_ctx
                 )
-            ctx.py_callback += f"\n\n{uprobe.script}"
-            ctxes.append(dataclasses.asdict(ctx))
-        return {"uprobes": ctxes}
+            if unused:
+                define_ctx.py_callback = ""
+            decodes.append((define.varname, define_ctx.py_callback))
+            define_ctx.py_callback = ""
+            site.merge(define_ctx)
+        return site, decodes
+
+
+# defines only reading values for the script, dropped when it never uses them
+READERS = (
+    program.PidDefine,
+    program.TidDefine,
+    program.CommDefine,
+    program.StackDefine,
+    program.PeekDefine,
+)
+
+
+def statement_names(node: ast.AST) -> {str}:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)}
+
+
+def script_names(script: str) -> {str}:
+    """Names the script uses, None if that can't be told, e.g. the script
+    isn't valid python or looks names up with locals()"""
+    try:
+        names = statement_names(ast.parse(script))
+    except SyntaxError:
+        return None
+    if names & {"locals", "vars", "eval", "exec"}:
+        return None
+    return names
+
+
+def lazy_callback(decodes: [(str, str)], script: str, names: {str}) -> str:
+    """The script with each decode right before the first top-level
+    statement using its variable, so an early return skips the rest, e.g.
+    walking the stack; all go first when names is None"""
+    lines = script.split("\n")
+    starts: {str: int} = {}
+    if names is not None:
+        for stmt in reversed(ast.parse(script).body):
+            lineno = min(
+                [stmt.lineno]
+                + [d.lineno for d in getattr(stmt, "decorator_list", [])]
+            )
+            for name in statement_names(stmt):
+                starts[name] = lineno - 1
+
+    at: {int: [str]} = {}
+    for varname, py_callback in decodes:
+        if py_callback:
+            at.setdefault(starts.get(varname, 0), []).append(py_callback)
+    head = "\n".join(at.pop(0, []))
+    for i in sorted(at, reverse=True):
+        lines[i:i] = at[i]
+    body = "\n".join(lines)
+    return f"\n{head}\n\n{body}" if head else f"\n\n{body}"
+
+
+def timer_tick_ns(period: int) -> int:
+    """Ticks a tenth of the period, down to 1ms, unless the period is
+    shorter"""
+    return min(period, max(period // 10, 1_000_000))
+
+
+def timer_context(uprobe: program.Uprobe, extra_ctx: dict) -> UprobeContext:
+    pids = split_list(extra_ctx.get("attach_pids"))
+    if not pids:
+        raise ValueError("attach_pids is required for timer probes")
+
+    # every cpu ticks, and a tick only sees the task running on its cpu, so
+    # samples are taken while the tracee is on-cpu: ticks finer than the
+    # period catch a mostly sleeping tracee, throttled to one per period
+    period = uprobe.address.timer_ns
+    tick = timer_tick_ns(period)
+    return UprobeContext(
+        c_global=f"BPF_ARRAY(timer{uprobe.idx}, u64, 1);",
+        c_guard=f"""
+{{
+    u32 timer_pid = bpf_get_current_pid_tgid() >> 32;
+    if ({" && ".join(f"timer_pid != {pid}" for pid in pids)})
+        return 0;
+    int zero = 0;
+    u64 now = bpf_ktime_get_ns();
+    u64 *last = timer{uprobe.idx}.lookup(&zero);
+    if (!last || now - *last < {period - tick // 2})
+        return 0;
+    *last = now;
+}}
+""",
+    )
+
+
+def split_list(value: str) -> [str]:
+    """Values in extra vars are separated by colons, e.g. pids=233:234"""
+    if not value:
+        return []
+    return [v.strip() for v in value.split(":") if v.strip()]
 
 
 @functools.singledispatch
@@ -108,19 +348,134 @@ def _(stack: program.StackDefine, __, ___, extra_ctx: dict):
         sym_pid = extra_ctx["sym_pid"]
     except KeyError:
         raise ValueError("sym_pid is required to render bcc script for stack")
+    if extra_ctx.get("capture"):
+        raise ValueError("$stack is not supported in capture mode")
 
     return UprobeContext(
         c_data="int stack_id;",
         c_global=f"BPF_STACK_TRACE(stack_trace{stack.uprobe_idx}, 128);",
         c_callback=f"data.stack_id = stack_trace{stack.uprobe_idx}.get_stackid(ctx, BPF_F_USER_STACK);",  # noqa
         py_data='("stack_id", ctypes.c_int),',
+        # no temporaries, the walk may land in the middle of the script
         py_callback=f"""
-syms = []
-for addr in b.get_table('stack_trace{stack.uprobe_idx}').walk(event.stack_id):
-    sym = b.sym(addr, {sym_pid}, show_module=True, show_offset=True)
-    syms.append(sym.decode())
-{stack.varname} = '\\n'.join(syms)
+{stack.varname} = '\\n'.join(
+    b.sym(addr, {sym_pid}, show_module=True, show_offset=True).decode()
+    for addr in b['stack_trace{stack.uprobe_idx}'].walk(event.stack_id)
+)
+""",
+    )
+
+
+def guard_context(
+    guard: program.GuardDefine,
+    extra_ctx: dict,
+    name: str,
+    fields: str,
+    c_guard: str,
+    shared: bool = False,
+) -> UprobeContext:
+    """Guard state is per cpu, or one entry all cpus update if shared"""
+    if guard.varname and extra_ctx.get("capture"):
+        raise ValueError(
+            f"{guard.varname}={guard.express} is not supported in capture mode"  # noqa
+        )
+
+    table = f"{name}{guard.uprobe_idx}_{guard.idx}"
+    dropped = f"sum(v.dropped for v in b['{table}'][0])"
+    if shared:
+        dropped = f"b['{table}'][0].dropped"
+    return UprobeContext(
+        c_global=f"""
+struct {table}_t {{
+    {fields}
+    u64 dropped;
+}};
+{"BPF_ARRAY" if shared else "BPF_PERCPU_ARRAY"}({table}, struct {table}_t, 1);
+""",
+        c_guard=f"""
+{{
+    int zero = 0;
+    struct {table}_t *{name} = {table}.lookup(&zero);
+    if ({name}) {{
+{textwrap.indent(textwrap.dedent(c_guard).strip(), " " * 8)}
+    }}
+}}
+""",
+        py_callback=f"{guard.varname} = {dropped}" if guard.varname else "",
+        py_report=f"print('uprobe{guard.uprobe_idx} {guard.express}:', {dropped}, 'dropped')",  # noqa
+    )
+
+
+@convert.register
+def _(sample: program.SampleDefine, __, ___, extra_ctx: dict):
+    return guard_context(
+        sample,
+        extra_ctx,
+        "sample",
+        "u64 seen;",
+        f"""
+        if (sample->seen++ % {sample.arg}) {{
+            sample->dropped++;
+            return 0;
+        }}
+""",
+    )
+
+
+@convert.register
+def _(ratelimit: program.RateLimitDefine, __, ___, extra_ctx: dict):
+    # token bucket refilled at arg tokens per second, 1 token = 1e9 units
+    return guard_context(
+        ratelimit,
+        extra_ctx,
+        "ratelimit",
+        "u64 tokens;\n    u64 last_ns;",
+        f"""
+        u64 now = bpf_ktime_get_ns();
+        u64 elapsed = now - ratelimit->last_ns;
+        if (elapsed > 1000000000)
+            elapsed = 1000000000;
+        ratelimit->last_ns = now;
+        ratelimit->tokens += elapsed * {ratelimit.arg};
+        if (ratelimit->tokens > {ratelimit.arg}000000000ULL)
+            ratelimit->tokens = {ratelimit.arg}000000000ULL;
+        if (ratelimit->tokens < 1000000000) {{
+            ratelimit->dropped++;
+            return 0;
+        }}
+        ratelimit->tokens -= 1000000000;
+""",
+    )
+
+
+@convert.register
+def _(breaker: program.BreakerDefine, __, ___, extra_ctx: dict):
+    # trips once hits of the probe within one second exceed arg, and stays
+    # tripped; the state is shared so one trip stops every cpu. Racing
+    # window resets may forget a few hits, which only delays a trip
+    return guard_context(
+        breaker,
+        extra_ctx,
+        "breaker",
+        "u64 window_ns;\n    u64 hits;\n    u64 tripped;",
+        f"""
+        if (breaker->tripped) {{
+            __sync_fetch_and_add(&breaker->dropped, 1);
+            return 0;
+        }}
+        u64 now = bpf_ktime_get_ns();
+        if (now - breaker->window_ns >= 1000000000) {{
+            breaker->window_ns = now;
+            breaker->hits = 0;
+        }}
+        __sync_fetch_and_add(&breaker->hits, 1);
+        if (breaker->hits > {breaker.arg}) {{
+            breaker->tripped = 1;
+            __sync_fetch_and_add(&breaker->dropped, 1);
+            return 0;
+        }}
 """,
+        shared=True,
     )
 
 
@@ -208,6 +563,40 @@ class Float(CastType):
         return "ctypes.c_double"
 
 
+def gen_reads(reg: str, ops: [str], dst: str, tmp: str) -> str:
+    """C code dereferencing ops from reg into dst, e.g. $sp+8*+16* reads
+    the pointer at sp+8 into a temporary, then dst from that plus 16."""
+    r = ["void"]
+    pointer = f"ctx->{reg}"
+    if reg.startswith("0x"):  # absolute address, e.g. globals
+        pointer = reg
+    elif reg == "elem":  # element of a gathered slice
+        pointer = f"{tmp}e"
+    for j, op in enumerate(ops[:-1]):
+        if op == "*":
+            r[0] += f" *{tmp}{j}, "
+            r.append(
+                f"bpf_probe_read(&{tmp}{j}, sizeof({tmp}{j}), (void*){pointer});"  # noqa
+            )
+            pointer = f"{tmp}{j}"
+
+        elif op.startswith(("+", "-")):
+            pointer += op
+
+    if ops and ops[-1] == "*":
+        r.append(
+            f"bpf_probe_read(&{dst}, sizeof({dst}), (void*){pointer});"
+        )
+
+    else:
+        r.append(f"{dst} = {pointer};")
+
+    r[0] = r[0].rstrip(", ") + ";"
+    if r[0] == "void;":
+        del r[0]
+    return "\n".join(r)
+
+
 @convert.register
 def _(peek: program.PeekDefine, interpreter, ctx, __):
     reg, *ops, cast_type = peek.interpret(ctx.address, interpreter)
@@ -216,31 +605,8 @@ def _(peek: program.PeekDefine, interpreter, ctx, __):
         return CastType.find_specific(cast_type).c_data.format(peek.idx)
 
     def gen_c_callback() -> str:
-        r = ["void"]
-        pointer, i = f"ctx->{reg}", peek.idx
-        for j, op in enumerate(ops[:-1]):
-            if op == "*":
-                r[0] += f" *a{i}{j}, "
-                r.append(
-                    f"bpf_probe_read(&a{i}{j}, sizeof(a{i}{j}), (void*){pointer});"  # noqa
-                )
-                pointer = f"a{i}{j}"
-
-            elif op.startswith(("+", "-")):
-                pointer += op
-
-        if ops and ops[-1] == "*":
-            r.append(
-                f"bpf_probe_read(&data.peek{i}, sizeof(data.peek{i}), (void*){pointer});"  # noqa
-            )
-
-        else:
-            r.append(f"data.peek{i} = {pointer};")
-
-        r[0] = r[0].rstrip(", ") + ";"
-        if r[0] == "void;":
-            del r[0]
-        return "\n".join(r)
+        i = peek.idx
+        return gen_reads(reg, ops, f"data.peek{i}", f"a{i}")
 
     def gen_py_data() -> str:
         ctypes_field = CastType.find_specific(cast_type).py_data
@@ -255,3 +621,193 @@ def _(peek: program.PeekDefine, interpreter, ctx, __):
         py_data=gen_py_data(),
         py_callback=gen_py_callback(),
     )
+
+
+C_KEYWORDS = {
+    "auto", "char", "const", "double", "enum", "extern", "float", "int",
+    "long", "register", "short", "signed", "sizeof", "static", "struct",
+    "typedef", "union", "unsigned", "void", "volatile", "while",
+}  # fmt: skip
+
+
+def field_name(field) -> str:
+    if field.name == "_":  # blank fields, usually padding
+        return f"_{field.offset}"
+    if field.name in C_KEYWORDS:
+        return f"{field.name}_"
+    return field.name
+
+
+def padded(fields: list, size: int) -> [(str, int, object)]:
+    """(name, size, field) of fields padded up to their offsets and to
+    size, field is None for padding"""
+    r, end = [], 0
+    for f in fields:
+        if f.offset > end:
+            r.append((f"_pad{end}", f.offset - end, None))
+        r.append((field_name(f), f.size, f))
+        end = f.offset + f.size
+    if size > end:
+        r.append((f"_pad{end}", size - end, None))
+    return r
+
+
+def gen_c_struct(fields: list, size: int = 0) -> str:
+    r = []
+    for name, n, f in padded(fields, size):
+        kind = f.kind if f else "bytes"
+        if kind == "struct":
+            r.append(f"{gen_c_struct(f.fields, n)} {name};")
+        elif kind in {"int", "uint"} and n in {1, 2, 4, 8}:
+            r.append(f"{'s' if kind == 'int' else 'u'}{n * 8} {name};")
+        elif kind == "float" and n in {4, 8}:
+            r.append(f"{'float' if n == 4 else 'double'} {name};")
+        elif kind == "pointer":
+            r.append(f"u64 {name};")
+        elif kind == "bool":
+            r.append(f"u8 {name};")
+        else:
+            r.append(f"u8 {name}[{n}];")
+    body = textwrap.indent("\n".join(r), " " * 4)
+    return f"struct {{\n{body}\n}} __attribute__((packed))"
+
+
+def gen_py_struct(fields: list, size: int = 0) -> str:
+    r = []
+    for name, n, f in padded(fields, size):
+        kind = f.kind if f else "bytes"
+        if kind == "struct":
+            t = gen_py_struct(f.fields, n)
+        elif kind in {"int", "uint"} and n in {1, 2, 4, 8}:
+            t = f"ctypes.c_{kind}{n * 8}"
+        elif kind == "float" and n in {4, 8}:
+            t = "ctypes.c_float" if n == 4 else "ctypes.c_double"
+        elif kind == "pointer":
+            t = "ctypes.c_uint64"
+        elif kind == "bool":
+            t = "ctypes.c_bool"
+        else:
+            t = f"ctypes.c_uint8 * {n}"
+        r.append(f'("{name}", {t})')
+    return (
+        'type("Struct", (ctypes.Structure,), '
+        f'{{"_pack_": 1, "_fields_": [{", ".join(r)}]}})'
+    )
+
+
+@convert.register
+def _(struct: program.StructDefine, interpreter, ctx, __):
+    # one read copies every member, whatever the number of them
+    (reg, *ops), fields = struct.interpret(ctx.address, interpreter)
+    i = struct.idx
+    return UprobeContext(
+        c_data=f"{gen_c_struct(fields)} peek{i};",
+        c_callback=gen_reads(reg, ops, f"data.peek{i}", f"a{i}"),
+        py_data=f'("peek{i}", {gen_py_struct(fields)}),',
+        py_callback=f"{struct.varname} = event.peek{i}",
+    )
+
+
+@convert.register
+def _(gather: program.GatherDefine, interpreter, ctx, __):
+    (array_reg, *array_ops), (len_reg, *len_ops), size, elem, cast_type = (
+        gather.interpret(ctx.address, interpreter)
+    )
+    elem_reg, *elem_ops = elem
+    _, lo, hi, _, _ = gather.slice
+    cast, i, n = CastType.find_specific(cast_type), gather.idx, hi - lo
+
+    elem_reads = gen_reads(elem_reg, elem_ops, f"data.peek{i}[k]", f"a{i}")
+    # a constant bound keeps the loop unrollable for the verifier
+    c_callback = f"""
+{{
+    u64 a{i}a = 0, a{i}n = 0;
+    {{
+{textwrap.indent(gen_reads(array_reg, array_ops, f"a{i}a", f"a{i}a"), " " * 8)}
+    }}
+    {{
+{textwrap.indent(gen_reads(len_reg, len_ops, f"a{i}n", f"a{i}n"), " " * 8)}
+    }}
+    a{i}n = a{i}n > {lo} ? a{i}n - {lo} : 0;
+    if (a{i}n > {n})
+        a{i}n = {n};
+    data.peek{i}_n = a{i}n;
+    #pragma unroll
+    for (int k = 0; k < {n}; k++) {{
+        if (k >= a{i}n)
+            break;
+        u64 a{i}e = a{i}a + ({lo} + k) * {size};
+{textwrap.indent(elem_reads, " " * 8)}
+    }}
+}}
+"""
+    return UprobeContext(
+        c_data=f"{cast.c_data.format(f'{i}[{n}]')}\nu32 peek{i}_n;",
+        c_callback=c_callback,
+        py_data=f'("peek{i}", ({cast.py_data}) * {n}),\n("peek{i}_n", ctypes.c_uint32),',  # noqa
+        py_callback=f"{gather.varname} = event.peek{i}[: event.peek{i}_n]",
+    )
+
+
+def span_key(span: program.SpanDefine, interpreter, ctx) -> str:
+    """C code computing the u64 span key into span_key{idx}"""
+    key = f"span_key{span.idx}"
+    if span.key == "$tid":
+        return f"u64 {key} = bpf_get_current_pid_tgid();"
+    reg, *ops, cast_type = span.interpret(ctx.address, interpreter)
+    cast = CastType.find_specific(cast_type)
+    if not isinstance(cast, Int):
+        raise ValueError(f"span key must be an integer: {span.key}")
+    return f"""
+u{cast.n} {key}_v = 0;
+{{
+{textwrap.indent(gen_reads(reg, ops, f"{key}_v", f"s{span.idx}"), " " * 4)}
+}}
+u64 {key} = {key}_v;
+"""
+
+
+@convert.register
+def _(start: program.StartDefine, interpreter, ctx, __):
+    i = start.idx
+    c_callback = f"""
+{{
+{textwrap.indent(span_key(start, interpreter, ctx).strip(), " " * 4)}
+    u64 span_ts{i} = bpf_ktime_get_ns();
+    span_{start.name}.update(&span_key{i}, &span_ts{i});
+"""
+    if not start.varname:
+        return UprobeContext(c_callback=c_callback + "}")
+
+    # named starts report the start timestamp
+    return UprobeContext(
+        c_data=f"u64 span{i};",
+        c_callback=c_callback + f"    data.span{i} = span_ts{i};\n}}",
+        py_data=f'("span{i}", ctypes.c_uint64),',
+        py_callback=f"{start.varname} = event.span{i}",
+    )
+
+
+@convert.register
+def _(elapsed: program.ElapsedDefine, interpreter, ctx, __):
+    # the start is consumed, so a span is reported at most once; other
+    # defines of the probe still run when there is nothing to report
+    i = elapsed.idx
+    return UprobeContext(
+        c_data=f"u64 span{i};",
+        c_callback=f"""
+u8 span_done{i} = 0;
+{{
+{textwrap.indent(span_key(elapsed, interpreter, ctx).strip(), " " * 4)}
+    u64 *span_ts{i} = span_{elapsed.name}.lookup(&span_key{i});
+    if (span_ts{i}) {{
+        data.span{i} = bpf_ktime_get_ns() - *span_ts{i};
+        span_{elapsed.name}.delete(&span_key{i});
+        span_done{i} = data.span{i} >= {elapsed.threshold_ns}ULL;
+    }}
+}}
+""",
+        c_submit=f"span_done{i}",
+        py_data=f'("span{i}", ctypes.c_uint64),',
+        py_callback=f"{elapsed.varname} = event.span{i}",
+    )
@@ -3,6 +3,7 @@ import jinja2
 
 from .. import elf
 from .. import program
+from .. import timings
 from . import context
 
 
@@ -20,4 +21,7 @@ def render(
     )
 
     context_manager = context.Manager(uprobes, elf_interpreter, extra_vars)
-    return tmpl.render(**context_manager.dump_context())
+    with timings.phase("context"):
+        ctx = context_manager.dump_context()
+    with timings.phase("jinja"):
+        return tmpl.render(**ctx)
@@ -0,0 +1,78 @@
+import gzip
+import json
+import ctypes
+import struct
+import textwrap
+
+MAGIC = b"RRRCAP1\n"
+HEADER = struct.Struct("<I")  # header size, followed by json header
+RECORD = struct.Struct("<HQI")  # uprobe idx, timestamp ns, payload size
+
+
+def dump_header(uprobes: [dict]) -> bytes:
+    header = json.dumps(
+        {
+            "uprobes": [
+                {
+                    "idx": uprobe["idx"],
+                    "py_data": uprobe["py_data"],
+                    "py_callback": uprobe["py_callback"],
+                }
+                for uprobe in uprobes
+            ]
+        }
+    ).encode()
+    return MAGIC + HEADER.pack(len(header)) + header
+
+
+def open_capture(filename: str):
+    with open(filename, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    return gzip.open(filename, "rb") if compressed else open(filename, "rb")
+
+
+def load_callbacks(header: dict, namespace: dict) -> {int: (type, callable)}:
+    callbacks = {}
+    for uprobe in header["uprobes"]:
+        idx = uprobe["idx"]
+        source = f"""
+class Data{idx}(ctypes.Structure):
+    _fields_ = [
+{textwrap.indent(uprobe["py_data"], " " * 8)}
+    ]
+
+def callback{idx}(event, capture_ts):
+{textwrap.indent(uprobe["py_callback"], " " * 4)}
+    pass
+"""
+        exec(compile(source, f"<uprobe{idx}>", "exec"), namespace)
+        callbacks[idx] = (namespace[f"Data{idx}"], namespace[f"callback{idx}"])
+    return callbacks
+
+
+def read_records(f) -> (int, int, bytes):
+    try:
+        while len(record := f.read(RECORD.size)) == RECORD.size:
+            idx, ts, size = RECORD.unpack(record)
+            payload = f.read(size)
+            if len(payload) < size:
+                return
+            yield idx, ts, payload
+    except EOFError:  # gzip stream not closed by an interrupted capture
+        return
+
+
+def decode(filename: str) -> int:
+    with open_capture(filename) as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"invalid capture file: {filename}")
+        (size,) = HEADER.unpack(f.read(HEADER.size))
+        header = json.loads(f.read(size))
+
+        callbacks = load_callbacks(header, {"ctypes": ctypes, "b": None})
+        n = 0
+        for idx, ts, payload in read_records(f):
+            data_cls, callback = callbacks[idx]
+            callback(data_cls.from_buffer_copy(payload), ts)
+            n += 1
+    return n
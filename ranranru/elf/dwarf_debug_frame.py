@@ -1,6 +1,8 @@
 from .utils import yield_elf_lines
+from .. import timings
 
 
+@timings.timed
 def find_cfa_expr(dwarf_filename: str, low_pc: str, uprobe_addr: str) -> str:
     low_pc = low_pc.removeprefix("0x").encode()
     uprobe_addr = int(uprobe_addr, 16)
@@ -1,10 +1,26 @@
+import os
 import re
+import bisect
+import threading
+import collections
 import dataclasses
+import multiprocessing
+import concurrent.futures
 from .utils import yield_elf_lines
+from .. import timings
 
-PAT_DW_AT_location = re.compile(r"DW_AT_location\s*:\s*(.*)")
 PAT_DW_OP = re.compile(r"\((.*)\)")
-PAT_NODE = re.compile(r"^<(\d)>.*?(DW_TAG_\w+)")
+PAT_DIE = re.compile(r"^<(\d+)><(\w+)>: Abbrev Number: \d+ \((DW_TAG_\w+)\)")
+PAT_DIE_ATTR = re.compile(r"^<\w+>\s+(DW_AT_\w+)\s*:\s*(.*)")
+PARALLEL_MIN_LINES = 200_000  # smaller dumps are indexed in-process
+
+_index: {str: "Index"} = {}
+_index_locks: {str: threading.Lock} = collections.defaultdict(threading.Lock)
+_index_locks_lock = threading.Lock()
+
+
+class ParamNotFound(ValueError):
+    pass
 
 
 @dataclasses.dataclass
@@ -34,12 +50,29 @@ class Subprogram:
     low_pc: str = ""
     high_pc: str = ""
     params: [Parameter] = dataclasses.field(default_factory=list)
+    # inline sites within, in document order, so nested ones follow
+    inlined: ["InlinedSubroutine"] = dataclasses.field(default_factory=list)
 
     def get_param(self, varname: str) -> Parameter:
         for param in self.params:
             if param.name == varname:
                 return param
-        raise ValueError(f"param not found: {varname}")
+        raise ParamNotFound(f"param not found: {varname}")
+
+
+@dataclasses.dataclass
+class InlinedSubroutine(Subprogram):
+    origin: str = ""
+    ranges: str = ""
+    call_line: str = ""
+
+
+@dataclasses.dataclass
+class Die:
+    level: int
+    offset: str
+    tag: str
+    attrs: {str: str} = dataclasses.field(default_factory=dict)
 
 
 @dataclasses.dataclass
@@ -54,6 +87,8 @@ class Type:
     tag: str
     name: str = ""
     type_addr: str = ""
+    byte_size: int = 0
+    encoding: str = ""
     members: [Member] = dataclasses.field(default_factory=list)
 
     def is_structure(self) -> bool:
@@ -62,123 +97,318 @@ class Type:
     def is_pointer(self) -> bool:
         return self.tag == "DW_TAG_pointer_type"
 
+    def is_typedef(self) -> bool:
+        return self.tag == "DW_TAG_typedef"
 
-def find_subprogram(  # noqa
-    dwarf_filename: str, uprobe_addr: str
-) -> Subprogram:
-    uprobe_addr = int(uprobe_addr, 16)
-    subprogram = param = None
-    ctx: [(int, str)] = [(-1, "")]
-    for line in yield_elf_lines(dwarf_filename, "Wi"):
-        if b"DW_TAG_" in line and (m := PAT_NODE.match(line.decode())):
-            no, tag = int(m.group(1)), m.group(2)
-            while ctx and ctx[-1][0] >= no:
-                if ctx[-1][1] == "DW_TAG_subprogram" and subprogram:
-                    return subprogram
-                if (
-                    ctx[-1][1]
-                    in {"DW_TAG_formal_parameter", "DW_TAG_variable"}
-                    and param
-                ):
-                    subprogram.params.append(param)
-                    param = None
-                ctx.pop()
-            if (
-                tag in {"DW_TAG_formal_parameter", "DW_TAG_variable"}
-                and subprogram
-            ):
-                param = Parameter()
-            ctx.append((no, tag))
-            continue
-
-        if b"DW_AT_name" in line:
-            if ctx[-1][1] == "DW_TAG_subprogram":
-                subprogram_name = line.decode().split()[-1]
-            elif (
-                ctx[-1][1] in {"DW_TAG_formal_parameter", "DW_TAG_variable"}
-                and param
-            ):
-                param.name = line.decode().split()[-1]
-            continue
-
-        if b"DW_AT_low_pc" in line and ctx[-1][1] == "DW_TAG_subprogram":
-            low_pc = int(line.decode().split()[-1], 16)
-            continue
-
-        if b"DW_AT_high_pc" in line and ctx[-1][1] == "DW_TAG_subprogram":
-            high_pc = int(line.decode().split()[-1], 16)
-            if low_pc <= uprobe_addr < high_pc:
-                subprogram = Subprogram(
-                    subprogram_name, f"{low_pc:x}", f"{high_pc:x}"
-                )
-            continue
-
-        if (
-            b"DW_AT_type" in line
-            and ctx[-1][1] in {"DW_TAG_formal_parameter", "DW_TAG_variable"}
-            and param
-        ):
-            param.type_addr = line.decode().split()[-1].strip("<>")
-            continue
 
-        if (
-            b"DW_AT_location" in line
-            and ctx[-1][1] in {"DW_TAG_formal_parameter", "DW_TAG_variable"}
-            and param
-        ):
-            param.dw_at_location = PAT_DW_AT_location.search(
-                line.decode()
-            ).group(1)
-            continue
+@dataclasses.dataclass
+class Field:
+    """Member of a struct layout, kind is one of int, uint, float, bool,
+    pointer, bytes and struct, whose members are in fields"""
 
+    name: str
+    offset: int
+    size: int
+    kind: str
+    fields: ["Field"] = dataclasses.field(default_factory=list)
 
-def find_type(dwarf_filename: str, type_addr: str) -> Type:  # noqa
-    type_addr = type_addr.removeprefix("0x").encode()
-    t = member = None
-    for line in yield_elf_lines(dwarf_filename, "Wi"):
-        if type_addr in line and b"type" in line and b"DW_TAG" in line:
-            tag = line.decode().split()[-1].strip("()")
-            t = Type(tag)
-            continue
 
-        if not t:
+def parse_dies(lines: [bytes]) -> Die:
+    die = None
+    for line in lines:
+        if not line.startswith(b"<"):
             continue
-
-        # all below are within the type
         line = line.decode()
+        if m := PAT_DIE.match(line):
+            if die:
+                yield die
+            die = Die(int(m.group(1)), f"0x{m.group(2)}", m.group(3))
+        elif die and (m := PAT_DIE_ATTR.match(line)):
+            die.attrs[m.group(1)] = m.group(2).strip()
+    if die:
+        yield die
 
-        if "DW_TAG_" in line and not line.startswith("<2>"):
-            return t
-
-        if "DW_AT_name" in line and not member:
-            t.name = line.split()[-1]
-            continue
-
-        if "DW_AT_type" in line and not member:
-            t.type_addr = line.split()[-1].strip("<>")
-            continue
-
-        if member and line.startswith(("<1>", "<2>", "<3>")):
-            t.members.append(member)
-            member = None
-
-        if "DW_TAG_member" in line:
-            member = Member()
-            continue
-
-        if not member:
-            continue
-
-        # all below are within a member
-
-        if "DW_AT_name" in line:
-            member.name = line.split()[-1]
-            continue
-
-        if "DW_AT_data_member_location" in line:
-            member.offset = int(line.split()[-1])
-            continue
 
-        if "DW_AT_type" in line:
-            member.type_addr = line.split()[-1].strip("<>")
-            continue
+@dataclasses.dataclass
+class Index:
+    """Subprograms, types and global variables of .debug_info, built per
+    compilation unit and merged in unit order. Entries are the plain rows
+    index_lines makes, which pickle cheaply out of workers; objects are
+    built from them on lookup"""
+
+    # [low_pc, high_pc, name, [param], [site]], a site being
+    # [low_pc, high_pc, origin, ranges, call_line, [(origin, location)]]
+    subprograms: [list] = dataclasses.field(default_factory=list)
+    # offset -> [tag, name, type_addr, byte_size, encoding, [member]]
+    types: {int: list} = dataclasses.field(default_factory=dict)
+    type_names: {str: str} = dataclasses.field(default_factory=dict)
+    # params and globals are (name, type_addr, location)
+    globals: {str: tuple} = dataclasses.field(default_factory=dict)
+    # abstract subprograms and their params, which inline sites refer to
+    origins: {str: str} = dataclasses.field(default_factory=dict)
+    origin_params: {str: tuple} = dataclasses.field(default_factory=dict)
+
+    def merge(self, other: "Index"):
+        self.subprograms += other.subprograms
+        self.types.update(other.types)
+        for name, offset in other.type_names.items():
+            self.type_names.setdefault(name, offset)
+        self.globals.update(other.globals)
+        self.origins.update(other.origins)
+        self.origin_params.update(other.origin_params)
+
+    def finish(self):
+        self.subprograms.sort(key=lambda row: row[0])
+        self.low_pcs = [row[0] for row in self.subprograms]
+        self.built: {(str, int): object} = {}
+
+    def subprogram(self, i: int) -> Subprogram:
+        if ("subprogram", i) in self.built:
+            return self.built["subprogram", i]
+        low_pc, high_pc, name, params, sites = self.subprograms[i]
+        subprogram = Subprogram(
+            name,
+            f"{low_pc:x}",
+            f"{high_pc:x}",
+            [Parameter(*param) for param in params],
+        )
+        for site_low, site_high, origin, ranges, call_line, params in sites:
+            site = InlinedSubroutine(
+                name=self.origins.get(origin, ""),
+                low_pc=site_low,
+                high_pc=site_high,
+                origin=origin,
+                ranges=ranges,
+                call_line=call_line,
+            )
+            for param_origin, location in params:
+                name, type_addr, _ = self.origin_params.get(
+                    param_origin, ("", "", "")
+                )
+                site.params.append(Parameter(name, type_addr, location))
+            subprogram.inlined.append(site)
+        self.built["subprogram", i] = subprogram
+        return subprogram
+
+    def type(self, offset: int) -> Type:
+        if offset not in self.types:
+            return None
+        if ("type", offset) not in self.built:
+            *attrs, members = self.types[offset]
+            self.built["type", offset] = Type(
+                *attrs, [Member(*m) for m in members]
+            )
+        return self.built["type", offset]
+
+
+def index_lines(lines: [bytes]) -> Index:  # noqa
+    index = Index()
+    names: {str: str} = {}  # abstract subprograms name their instances
+    subprogram = t = abstract = None
+    sites: [(int, list)] = []
+    for die in parse_dies(lines):
+        if subprogram and die.level <= subprogram[0]:
+            subprogram = None
+        if abstract is not None and die.level <= abstract:
+            abstract = None
+        while sites and die.level <= sites[-1][0]:
+            sites.pop()
+        if t and die.level <= t[0]:
+            t = None
+
+        attrs = die.attrs
+        if die.tag == "DW_TAG_subprogram":
+            if "DW_AT_name" in attrs:
+                names[die.offset] = attrs["DW_AT_name"]
+            if "DW_AT_inline" in attrs:
+                abstract = die.level
+                index.origins[die.offset] = attrs.get("DW_AT_name", "")
+            if "DW_AT_low_pc" in attrs and "DW_AT_high_pc" in attrs:
+                origin = attrs.get("DW_AT_abstract_origin", "").strip("<>")
+                subprogram = (
+                    die.level,
+                    [
+                        int(attrs["DW_AT_low_pc"], 16),
+                        int(attrs["DW_AT_high_pc"], 16),
+                        attrs.get("DW_AT_name", names.get(origin, "")),
+                        [],
+                        [],
+                    ],
+                )
+                index.subprograms.append(subprogram[1])
+
+        elif die.tag == "DW_TAG_inlined_subroutine" and subprogram:
+            site = [
+                attrs.get("DW_AT_low_pc", ""),
+                attrs.get("DW_AT_high_pc", ""),
+                attrs.get("DW_AT_abstract_origin", "").strip("<>"),
+                attrs.get("DW_AT_ranges", ""),
+                attrs.get("DW_AT_call_line", ""),
+                [],
+            ]
+            subprogram[1][4].append(site)
+            sites.append((die.level, site))
+
+        elif die.tag in {"DW_TAG_formal_parameter", "DW_TAG_variable"}:
+            param = (
+                attrs.get("DW_AT_name", ""),
+                attrs.get("DW_AT_type", "").strip("<>"),
+                attrs.get("DW_AT_location", ""),
+            )
+            if subprogram:
+                subprogram[1][3].append(param)
+                if sites and die.level == sites[-1][0] + 1:
+                    # named after the abstract origin on lookup
+                    origin = attrs.get("DW_AT_abstract_origin", "")
+                    sites[-1][1][5].append((origin.strip("<>"), param[2]))
+            elif abstract is not None and die.level == abstract + 1:
+                index.origin_params[die.offset] = param
+            elif (
+                die.level == 1
+                and die.tag == "DW_TAG_variable"
+                and "DW_OP_addr" in param[2]
+            ):
+                index.globals[param[0]] = param
+
+        elif die.tag == "DW_TAG_member" and t and die.level == t[0] + 1:
+            t[1][5].append(
+                (
+                    attrs.get("DW_AT_name", ""),
+                    int(attrs.get("DW_AT_data_member_location", 0)),
+                    attrs.get("DW_AT_type", "").strip("<>"),
+                )
+            )
+
+        elif "type" in die.tag:
+            name = attrs.get("DW_AT_name", "")
+            t = (
+                die.level,
+                [
+                    die.tag,
+                    name,
+                    attrs.get("DW_AT_type", "").strip("<>"),
+                    int(attrs.get("DW_AT_byte_size", 0)),
+                    attrs.get("DW_AT_encoding", "").split("(")[-1].strip(")"),
+                    [],
+                ],
+            )
+            index.types[int(die.offset, 16)] = t[1]
+            if name and die.tag.endswith("_type"):
+                index.type_names.setdefault(name, die.offset)
+    return index
+
+
+def index_unit_range(dwarf_filename: str, start: int, end: int) -> Index:
+    # runs in a forked worker, which shares the parent's objdump cache
+    return index_lines(yield_elf_lines(dwarf_filename, "Wi")[start:end])
+
+
+def split_units(lines: [bytes], n: int) -> [(int, int)]:
+    """Line ranges of about len(lines) / n, cut at compilation units"""
+    starts = [
+        i
+        for i, line in enumerate(lines)
+        if line.startswith(b"Compilation Unit @")
+    ] or [0]
+    starts[0] = 0
+    size, ranges, begin = len(lines) // n + 1, [], 0
+    for i in starts[1:]:
+        if i - begin >= size:
+            ranges.append((begin, i))
+            begin = i
+    ranges.append((begin, len(lines)))
+    return ranges
+
+
+def build_index(dwarf_filename: str, workers: int = None) -> Index:
+    if dwarf_filename in _index:
+        return _index[dwarf_filename]
+
+    with _index_locks_lock:
+        lock = _index_locks[dwarf_filename]
+    with lock:  # concurrent renders of a binary share one build
+        if dwarf_filename not in _index:
+            _index[dwarf_filename] = build_index_locked(
+                dwarf_filename, workers
+            )
+    return _index[dwarf_filename]
+
+
+def build_index_locked(dwarf_filename: str, workers: int) -> Index:
+    with timings.phase("index"):
+        lines = yield_elf_lines(dwarf_filename, "Wi")
+        workers = workers or os.cpu_count() or 1
+        # forking while other threads run may copy locks they hold, e.g. in
+        # rrr serve, which builds the index at preload time instead
+        if (
+            workers > 1
+            and len(lines) >= PARALLEL_MIN_LINES
+            and threading.active_count() == 1
+        ):
+            ranges = split_units(lines, workers * 4)
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(workers, len(ranges)),
+                mp_context=multiprocessing.get_context("fork"),
+            ) as pool:
+                fragments = pool.map(
+                    index_unit_range,
+                    [dwarf_filename] * len(ranges),
+                    *zip(*ranges),
+                )
+                index = Index()
+                for fragment in fragments:
+                    index.merge(fragment)
+        else:
+            index = index_lines(lines)
+        index.finish()
+    return index
+
+
+def evict(dwarf_filename: str):
+    _index.pop(dwarf_filename, None)
+
+
+@timings.timed
+def find_subprogram(dwarf_filename: str, uprobe_addr: str) -> Subprogram:
+    index = build_index(dwarf_filename)
+    addr = int(uprobe_addr, 16)
+    i = bisect.bisect_right(index.low_pcs, addr)
+    if i and addr < index.subprograms[i - 1][1]:
+        return index.subprogram(i - 1)
+
+
+@timings.timed
+def find_type(dwarf_filename: str, type_addr: str) -> Type:
+    return build_index(dwarf_filename).type(int(type_addr, 16))
+
+
+@timings.timed
+def findall_inlined_subroutines(
+    dwarf_filename: str, function_name: str
+) -> [InlinedSubroutine]:
+    """Inline sites of the function, in address order of their callers"""
+    index = build_index(dwarf_filename)
+    return [
+        site
+        for i, (*_, sites) in enumerate(index.subprograms)
+        if any(index.origins.get(site[2]) == function_name for site in sites)
+        for site in index.subprogram(i).inlined
+        if site.name == function_name
+    ]
+
+
+@timings.timed
+def find_global_variable(dwarf_filename: str, names: [str]) -> Parameter:
+    """The longest of candidate names wins, e.g. main.counter over main"""
+    found = build_index(dwarf_filename).globals
+    for name in sorted(names, key=len, reverse=True):
+        if name in found:
+            return Parameter(*found[name])
+    raise ValueError(f"global variable not found: {names[0]}")
+
+
+@timings.timed
+def find_type_addr(dwarf_filename: str, name: str) -> str:
+    if offset := build_index(dwarf_filename).type_names.get(name):
+        return offset
+    raise ValueError(f"type not found: {name}")
@@ -1,6 +1,8 @@
 from .utils import yield_elf_lines
+from .. import timings
 
 
+@timings.timed
 def findall_filenames(dwarf_filename, suffix: str) -> {str}:
     suffix = f"{suffix}:".encode()
     filenames = []
@@ -10,6 +12,7 @@ def findall_filenames(dwarf_filename, suffix: str) -> {str}:
     return set(filenames)
 
 
+@timings.timed
 def findall_stmt_address(dwarf_filename, suffix: str, lineno: str) -> str:
     suffix = f"{suffix}:".encode()
     on = False
@@ -1,6 +1,8 @@
 from .utils import yield_elf_lines
+from .. import timings
 
 
+@timings.timed
 def find_location_desc(
     dwarf_filename: str, location_addr: str, uprobe_addr: str
 ) -> str:
@@ -12,6 +14,9 @@ def find_location_desc(
             on = True
             continue
 
+        if on and b"<End of list>" in line:
+            return
+
         if on:
             _, start, end, expr = line.decode().split(maxsplit=3)
             if int(start, 16) <= uprobe_addr < int(end, 16):
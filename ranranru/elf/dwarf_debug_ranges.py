@@ -0,0 +1,24 @@
+from .utils import yield_elf_lines
+from .. import timings
+
+
+@timings.timed
+def find_ranges(dwarf_filename: str, ranges_offset: str) -> [(int, int)]:
+    ranges_offset = int(ranges_offset, 16)
+    ranges = []
+    for line in yield_elf_lines(dwarf_filename, "WR"):
+        if b"(base address)" in line or b"<End of list>" in line:
+            if ranges and b"<End" in line:
+                return ranges
+            continue
+
+        parts = line.split()
+        if len(parts) != 3:
+            continue
+        try:
+            offset, begin, end = (int(p, 16) for p in parts)
+        except ValueError:
+            continue
+        if offset == ranges_offset:
+            ranges.append((begin, end))
+    return ranges
@@ -3,6 +3,7 @@ import re
 
 PAT_OP_REG = re.compile(r"DW_OP_reg.*?\((.*?)\)")
 PAT_OP_FBREG = re.compile(r"DW_OP_fbreg:\s*(-?\w+)")
+PAT_OP_ADDR = re.compile(r"DW_OP_addr:\s*(\w+)")
 
 
 def parse_op_reg(desc: str) -> str:
@@ -35,6 +36,11 @@ def parse_op_fbreg(desc: str, cfa: str) -> str:
     return f"{cfa}{offset}*"
 
 
+def parse_op_addr(desc: str) -> str:
+    addr = PAT_OP_ADDR.search(desc).group(1)
+    return f"$0x{addr}*"
+
+
 def parse(desc: str, cfa: str) -> str:
     res: [str] = []
     for d in desc.split(";"):
@@ -44,6 +50,8 @@ def parse(desc: str, cfa: str) -> str:
             res.append(parse_op_fbreg(d, cfa))
         elif "DW_OP_piece" in d:
             res.append(";")
+        elif "DW_OP_addr" in d:
+            res.append(parse_op_addr(d))
         elif "DW_OP_call_frame_cfa" in d:
             res.append(cfa + "*")
         else:
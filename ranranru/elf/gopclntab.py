@@ -0,0 +1,290 @@
+"""Function and line tables of Go's .gopclntab, decoded straight from the
+mmapped binary. Stripped builds (-ldflags='-s -w') keep the table, and it
+is much smaller than the DWARF line programs objdump has to dump."""
+import mmap
+import struct
+
+from .. import timings
+
+MAGICS = {0xFFFFFFFA: "1.16", 0xFFFFFFF0: "1.18", 0xFFFFFFF1: "1.20"}
+
+_cache: {str: "Table"} = {}
+
+
+def cstring(buf, offset: int) -> str:
+    return buf[offset:buf.find(b"\0", offset)].decode()
+
+
+def read_sections(buf) -> {str: (int, int, int)}:
+    """name -> (addr, offset, size) of ELF sections"""
+    if buf[:4] != b"\x7fELF":
+        raise ValueError("not an ELF file")
+    endian = "<" if buf[5] == 1 else ">"
+    if buf[4] == 2:  # ELFCLASS64
+        (shoff,) = struct.unpack_from(endian + "Q", buf, 0x28)
+        entsize, num, strndx = struct.unpack_from(endian + "HHH", buf, 0x3A)
+        header = struct.Struct(endian + "IIQQQQIIQQ")
+    else:
+        (shoff,) = struct.unpack_from(endian + "I", buf, 0x20)
+        entsize, num, strndx = struct.unpack_from(endian + "HHH", buf, 0x2E)
+        header = struct.Struct(endian + "IIIIIIIIII")
+
+    headers = [
+        header.unpack_from(buf, shoff + i * entsize) for i in range(num)
+    ]
+    if not headers:
+        return {}
+    strtab = headers[strndx][4]
+    return {
+        cstring(buf, strtab + name): (addr, offset, size)
+        for name, _, _, addr, offset, size, *_ in headers
+    }
+
+
+def find_symbol(buf, sections: {str: (int, int, int)}, names: {str}):
+    """name -> value of .symtab symbols, for builds that put the table in
+    another section, e.g. runtime.pclntab in .data.rel.ro"""
+    if ".symtab" not in sections or ".strtab" not in sections:
+        return {}
+    _, offset, size = sections[".symtab"]
+    _, strtab, _ = sections[".strtab"]
+    endian = "<" if buf[5] == 1 else ">"
+    if buf[4] == 2:
+        sym, fields = struct.Struct(endian + "IBBHQQ"), (0, 4)
+    else:
+        sym, fields = struct.Struct(endian + "IIIBBH"), (0, 1)
+    found = {}
+    for off in range(offset, offset + size, sym.size):
+        entry = sym.unpack_from(buf, off)
+        name = cstring(buf, strtab + entry[fields[0]])
+        if name in names:
+            found[name] = entry[fields[1]]
+    return found
+
+
+class Table:
+    def __init__(self, buf, start: int, text_addr: int):
+        self.buf = buf
+        (magic,) = struct.unpack_from("<I", buf, start)
+        if magic not in MAGICS:
+            raise ValueError(f"unsupported pclntab magic: {magic:#x}")
+        self.version = MAGICS[magic]
+        self.quantum, self.ptrsize = buf[start + 6], buf[start + 7]
+        uintptr = "<Q" if self.ptrsize == 8 else "<I"
+        fields = [
+            struct.unpack_from(uintptr, buf, start + 8 + i * self.ptrsize)[0]
+            for i in range(7 if self.version == "1.16" else 8)
+        ]
+        if self.version == "1.16":
+            fields.insert(2, 0)  # no textStart
+        (
+            self.nfunc,
+            _,
+            self.text_start,
+            funcname,
+            cu,
+            filetab,
+            pctab,
+            pcln,
+        ) = fields
+        self.text_start = self.text_start or text_addr  # PIE leaves it 0
+        self.funcname, self.cu, self.filetab, self.pctab, self.pcln = (
+            start + funcname,
+            start + cu,
+            start + filetab,
+            start + pctab,
+            start + pcln,
+        )
+        self._funcs: [(int, str, int)] = None
+        self.sections: {str: (int, int, int)} = {}
+
+    def funcs(self) -> [(int, str, int)]:
+        """(entry, name, _func offset) of every function"""
+        if self._funcs is not None:
+            return self._funcs
+        funcs = []
+        if self.version == "1.16":
+            entry = struct.Struct("<QQ" if self.ptrsize == 8 else "<II")
+            base = self.ptrsize
+        else:
+            entry = struct.Struct("<II")
+            base = 4
+        for i in range(self.nfunc):
+            pc, funcoff = entry.unpack_from(
+                self.buf, self.pcln + i * entry.size
+            )
+            if self.version != "1.16":
+                pc += self.text_start
+            (nameoff,) = struct.unpack_from(
+                "<i", self.buf, self.pcln + funcoff + base
+            )
+            funcs.append(
+                (pc, cstring(self.buf, self.funcname + nameoff), funcoff)
+            )
+        self._funcs = funcs
+        return funcs
+
+    def field(self, funcoff: int, index: int) -> int:
+        """uint32 fields following _func.nameOff: args, deferreturn, pcsp,
+        pcfile, pcln, npcdata, cuOffset"""
+        base = self.ptrsize if self.version == "1.16" else 4
+        (value,) = struct.unpack_from(
+            "<I", self.buf, self.pcln + funcoff + base + 4 * (index + 1)
+        )
+        return value
+
+    def uvarint(self, p: int) -> (int, int):
+        value = shift = 0
+        while True:
+            b = self.buf[p]
+            p += 1
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value, p
+            shift += 7
+
+    def pcvalues(self, offset: int, entry: int) -> (int, int, int):
+        """(begin, end, value) ranges of a pc-value table"""
+        if not offset:
+            return
+        p, pc, value, first = self.pctab + offset, entry, -1, True
+        while True:
+            uvdelta, p = self.uvarint(p)
+            if uvdelta == 0 and not first:
+                return
+            first = False
+            value += ~(uvdelta >> 1) if uvdelta & 1 else uvdelta >> 1
+            pcdelta, p = self.uvarint(p)
+            yield pc, pc + pcdelta * self.quantum, value
+            pc += pcdelta * self.quantum
+
+    def filename(self, cu_offset: int, index: int) -> str:
+        (offset,) = struct.unpack_from(
+            "<I", self.buf, self.cu + 4 * (cu_offset + index)
+        )
+        if offset == 0xFFFFFFFF:
+            return ""
+        return cstring(self.buf, self.filetab + offset)
+
+    def filenames(self) -> {str: int}:
+        """filename -> offset in filetab"""
+        names, p = {}, self.filetab
+        while p < self.pctab:
+            end = self.buf.find(b"\0", p)
+            names[self.buf[p:end].decode()] = p - self.filetab
+            p = end + 1
+        return names
+
+    def line_address(self, filename: str, lineno: int) -> int:
+        """Lowest pc of the line, inlined bodies included"""
+        # cutab slots naming the file, each owned by the closest compilation
+        # unit starting at or before it; functions of other units are skipped
+        target = self.filenames().get(filename)
+        slots = {
+            i
+            for i, (offset,) in enumerate(
+                struct.iter_unpack("<I", self.buf[self.cu:self.filetab])
+            )
+            if offset == target
+        }
+        cu_offsets = sorted({self.field(off, 6) for _, _, off in self.funcs()})
+        units = {
+            max((c for c in cu_offsets if c <= slot), default=None)
+            for slot in slots
+        }
+
+        found = None
+        for entry, _, funcoff in self.funcs():
+            cu_offset = self.field(funcoff, 6)
+            if cu_offset not in units:
+                continue
+            files = [
+                (begin, end)
+                for begin, end, index in self.pcvalues(
+                    self.field(funcoff, 3), entry
+                )
+                if self.filename(cu_offset, index) == filename
+            ]
+            if not files:
+                continue
+            for begin, end, line in self.pcvalues(
+                self.field(funcoff, 4), entry
+            ):
+                if line != lineno or (found is not None and begin >= found):
+                    continue
+                for file_begin, file_end in files:
+                    if file_begin <= begin < file_end:
+                        found = begin
+                        break
+        return found
+
+    def close(self):
+        self.buf.close()
+
+
+def find_table(buf) -> Table:
+    try:
+        sections = read_sections(buf)
+        table = None
+        text_addr = sections.get(".text", (0, 0, 0))[0]
+        if ".gopclntab" in sections:
+            table = Table(buf, sections[".gopclntab"][1], text_addr)
+        elif symbols := find_symbol(buf, sections, {"runtime.pclntab"}):
+            pclntab = symbols["runtime.pclntab"]
+            for addr, offset, size in sections.values():
+                if addr <= pclntab < addr + size:
+                    table = Table(buf, pclntab - addr + offset, text_addr)
+                    break
+        if table:
+            table.sections = sections
+        return table
+    except (ValueError, struct.error, IndexError):
+        pass
+    return None
+
+
+def load(filename: str) -> Table:
+    """None unless the binary carries a supported Go pclntab"""
+    if filename in _cache:
+        timings.count(cache_hits=1)
+        return _cache[filename]
+
+    with timings.phase("gopclntab"):
+        try:
+            with open(filename, "rb") as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # missing or empty, left to objdump
+            buf = None
+        table = find_table(buf) if buf else None
+        if buf and table is None:
+            buf.close()
+
+    _cache[filename] = table
+    return table
+
+
+def evict(filename: str):
+    if table := _cache.pop(filename, None):
+        table.close()
+
+
+@timings.timed
+def findall_addresses(filename: str, function_name: str) -> [(str, str)]:
+    return [
+        (f"{entry:016x}", name)
+        for entry, name, _ in load(filename).funcs()
+        if name.endswith(function_name)
+    ]
+
+
+@timings.timed
+def findall_filenames(filename: str, suffix: str) -> {str}:
+    return {
+        name for name in load(filename).filenames() if name.endswith(suffix)
+    }
+
+
+@timings.timed
+def find_line_address(filename: str, source: str, lineno: str) -> str:
+    addr = load(filename).line_address(source, int(lineno))
+    return None if addr is None else f"0x{addr:x}"
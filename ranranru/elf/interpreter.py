@@ -1,36 +1,88 @@
+from . import gopclntab
 from . import symbol_table
 from . import dwarf_debug_loc
 from . import dwarf_debug_line
 from . import dwarf_debug_info
 from . import dwarf_debug_frame
+from . import dwarf_debug_ranges
 from . import dwarf_location_desc
+from .utils import yield_elf_lines, evict
+
+OBJDUMP_FLAGS = ("t", "WL", "Wi", "Wo", "WR", "-dwarf=frames-interp")
+PCLNTAB_FLAGS = ("t", "WL")  # empty in stripped binaries, see pclntab
 
 
 class Interpreter:
     def __init__(self, dwarf_filename: str):
         self.dwarf_filename = dwarf_filename
 
+    @property
+    def pclntab(self) -> bool:
+        return gopclntab.load(self.dwarf_filename) is not None
+
+    @property
+    def stripped(self) -> bool:
+        table = gopclntab.load(self.dwarf_filename)
+        return table is not None and ".symtab" not in table.sections
+
+    def warm(self):
+        for flags in OBJDUMP_FLAGS:
+            if self.stripped and flags in PCLNTAB_FLAGS:
+                continue
+            yield_elf_lines(self.dwarf_filename, flags)
+        dwarf_debug_info.build_index(self.dwarf_filename)
+
+    def close(self):
+        evict(self.dwarf_filename)
+        gopclntab.evict(self.dwarf_filename)
+        dwarf_debug_info.evict(self.dwarf_filename)
+
     def find_address_by_filename_lineno(
         self, filename_suffix: str, lineno: str
     ) -> str:
-        candidates = dwarf_debug_line.findall_filenames(
-            self.dwarf_filename, filename_suffix
-        )
-        if len(candidates) > 1:
-            raise ValueError(
-                "ambiguous filename: {}".format(", ".join(candidates))
+        sources = [dwarf_debug_line]  # has cgo and C sources too
+        if self.pclntab:
+            sources.insert(0, gopclntab)
+        found = False
+        for lines in sources:
+            candidates = lines.findall_filenames(
+                self.dwarf_filename, filename_suffix
             )
-        if not candidates:
+            if len(candidates) > 1:
+                raise ValueError(
+                    "ambiguous filename: {}".format(", ".join(candidates))
+                )
+            if not candidates:
+                continue
+            found = True
+            if lines is gopclntab:
+                address = gopclntab.find_line_address(
+                    self.dwarf_filename, candidates.pop(), lineno
+                )
+            else:
+                address = dwarf_debug_line.findall_stmt_address(
+                    self.dwarf_filename, filename_suffix, lineno
+                )
+            if address:
+                return address
+
+        if not found:
             raise ValueError(f"file not found: {filename_suffix}")
+        raise ValueError(f"line not found: {filename_suffix}:{lineno}")
 
-        return dwarf_debug_line.findall_stmt_address(
-            self.dwarf_filename, filename_suffix, lineno
+    def findall_function_addresses(self, function_name: str) -> [(str, str)]:
+        addresses = []
+        if self.pclntab:
+            addresses = gopclntab.findall_addresses(
+                self.dwarf_filename, function_name
+            )
+        # cgo and C functions are only in .symtab
+        return addresses or symbol_table.findall_addresses(
+            self.dwarf_filename, function_name
         )
 
     def find_address_by_function_name(self, function_name: str) -> str:
-        addresses = symbol_table.findall_addresses(
-            self.dwarf_filename, function_name
-        )
+        addresses = self.findall_function_addresses(function_name)
         if not addresses:
             raise ValueError(f"function not found: {function_name}")
         if len(addresses) > 1:
@@ -42,17 +94,75 @@ class Interpreter:
 
         return "0x" + addresses[0][0]
 
+    def find_inlined_addresses(self, function_name: str) -> [str]:
+        """Out-of-line copy, if any, followed by every inline site."""
+        addresses = [
+            "0x" + addr
+            for addr, name in self.findall_function_addresses(function_name)
+            if name == function_name
+        ]
+        for subroutine in dwarf_debug_info.findall_inlined_subroutines(
+            self.dwarf_filename, function_name
+        ):
+            if subroutine.ranges:
+                ranges = dwarf_debug_ranges.find_ranges(
+                    self.dwarf_filename, subroutine.ranges
+                )
+                if not ranges:
+                    continue
+                low_pc = ranges[0][0]
+            else:
+                low_pc = int(subroutine.low_pc, 16)
+            addresses.append(f"0x{low_pc:016x}")
+
+        if not addresses:
+            raise ValueError(f"function not found: {function_name}")
+        return addresses
+
+    def find_scopes(
+        self, subprogram: dwarf_debug_info.Subprogram, uprobe_addr: str
+    ) -> [dwarf_debug_info.Subprogram]:
+        """Inline sites covering the address, innermost first, then the
+        subprogram itself"""
+        addr = int(uprobe_addr, 16)
+        scopes = []
+        for site in subprogram.inlined:
+            if site.ranges:
+                ranges = dwarf_debug_ranges.find_ranges(
+                    self.dwarf_filename, site.ranges
+                )
+            elif site.low_pc and site.high_pc:
+                ranges = [(int(site.low_pc, 16), int(site.high_pc, 16))]
+            else:
+                ranges = []
+            if any(low <= addr < high for low, high in ranges):
+                scopes.insert(0, site)
+        return scopes + [subprogram]
+
     def parse_var(self, uprobe_addr: str, varname: str) -> (str, str):
         subprogram = dwarf_debug_info.find_subprogram(
             self.dwarf_filename, uprobe_addr
         )
-        param = subprogram.get_param(varname)
+        for scope in self.find_scopes(subprogram, uprobe_addr):
+            try:
+                param = scope.get_param(varname)
+                break
+            except dwarf_debug_info.ParamNotFound:
+                continue
+        else:
+            raise dwarf_debug_info.ParamNotFound(f"param not found: {varname}")
+        if not param.dw_at_location:
+            raise ValueError(f"location not available: {varname}")
         if param.location_type == "location_list":
             desc = dwarf_debug_loc.find_location_desc(
                 self.dwarf_filename,
                 param.location,
                 uprobe_addr,
             )
+            if desc is None:
+                raise ValueError(
+                    f"location not available: {varname} at {uprobe_addr}"
+                )
         else:
             desc = param.location
 
@@ -61,10 +171,36 @@ class Interpreter:
         ).replace("rsp", "$sp")
         return dwarf_location_desc.parse(desc, cfa), param.type_addr
 
+    def parse_global(self, varname: str, members: [str]) -> (str, str, [str]):
+        """Go globals contain dots, e.g. main.counter.hits is member hits
+        of main.counter, so the longest matching name is taken."""
+        names = [
+            ".".join([varname, *members[:i]]) for i in range(len(members) + 1)
+        ]
+        var = dwarf_debug_info.find_global_variable(self.dwarf_filename, names)
+        members = members[names.index(var.name):]
+        loc_expr = dwarf_location_desc.parse(var.location, "")
+        return loc_expr, var.type_addr, members
+
     def find_expr_location(
         self, uprobe_addr: str, varname: str, members: [str]
     ) -> str:
-        loc_expr, type_addr = self.parse_var(uprobe_addr, varname)
+        return self.find_var_location(uprobe_addr, varname, members)[0]
+
+    def find_var_location(
+        self, uprobe_addr: str, varname: str, members: [str]
+    ) -> (str, str):
+        try:
+            if not uprobe_addr:  # timer probes only see globals
+                raise dwarf_debug_info.ParamNotFound(varname)
+            loc_expr, type_addr = self.parse_var(uprobe_addr, varname)
+        except dwarf_debug_info.ParamNotFound:
+            loc_expr, type_addr, members = self.parse_global(varname, members)
+        return self.find_member_location(loc_expr, type_addr, members)
+
+    def find_member_location(
+        self, loc_expr: str, type_addr: str, members: [str]
+    ) -> (str, str):
         for member_name in members:
             t = dwarf_debug_info.find_type(self.dwarf_filename, type_addr)
             while not t.is_structure():
@@ -83,4 +219,118 @@ class Interpreter:
                     break
             else:
                 raise ValueError(f"member not found: {member_name}")
-        return loc_expr
+        return loc_expr, type_addr
+
+    def find_goid_location(self) -> str:
+        """Go keeps the current g in r14 since the register ABI (1.17)"""
+        g = dwarf_debug_info.find_type_addr(self.dwarf_filename, "runtime.g")
+        return self.find_member_location("$r14*", g, ["goid"])[0]
+
+    def find_type_size(self, type_addr: str) -> int:
+        t = dwarf_debug_info.find_type(self.dwarf_filename, type_addr)
+        while not t.byte_size and t.type_addr:  # e.g. typedef
+            t = dwarf_debug_info.find_type(self.dwarf_filename, t.type_addr)
+        return t.byte_size
+
+    def find_slice_location(
+        self,
+        uprobe_addr: str,
+        varname: str,
+        members: [str],
+        elem_members: [str],
+    ) -> (str, str, int, str):
+        """Locations of the slice's array and len, the element size and
+        the location of elem_members relative to an element at $elem."""
+        loc_expr, type_addr = self.find_var_location(
+            uprobe_addr, varname, members
+        )
+        t = dwarf_debug_info.find_type(self.dwarf_filename, type_addr)
+        while not t.is_structure() and t.type_addr:
+            t = dwarf_debug_info.find_type(self.dwarf_filename, t.type_addr)
+        if not t.name.startswith("[]"):
+            raise ValueError(f"not a slice: {'.'.join([varname, *members])}")
+
+        array_expr, array_type = self.find_member_location(
+            loc_expr, type_addr, ["array"]
+        )
+        len_expr, _ = self.find_member_location(loc_expr, type_addr, ["len"])
+        elem_type = dwarf_debug_info.find_type(
+            self.dwarf_filename, array_type
+        ).type_addr
+        elem_expr, _ = self.find_member_location(
+            "$elem*", elem_type, elem_members
+        )
+        return (
+            array_expr,
+            len_expr,
+            self.find_type_size(elem_type),
+            elem_expr,
+        )
+
+    def find_struct_location(
+        self,
+        uprobe_addr: str,
+        varname: str,
+        members: [str],
+        first: str = None,
+        last: str = None,
+    ) -> (str, [dwarf_debug_info.Field]):
+        """Location of the struct, or of its members first to last, and
+        the layout of what is located"""
+        loc_expr, type_addr = self.find_var_location(
+            uprobe_addr, varname, members
+        )
+        t = dwarf_debug_info.find_type(self.dwarf_filename, type_addr)
+        while not t.is_structure():
+            if t.is_pointer():
+                loc_expr += "*"
+            elif not t.is_typedef():
+                raise ValueError(f"not a struct: {t.name}")
+            t = dwarf_debug_info.find_type(self.dwarf_filename, t.type_addr)
+        if ";" in loc_expr or not loc_expr.endswith("*"):
+            raise ValueError(f"struct not in memory: {t.name}")
+
+        fields = self.find_struct_fields(t)
+        if first:
+            names = [f.name for f in fields]
+            for name in (first, last):
+                if name not in names:
+                    raise ValueError(f"member not found: {name}")
+            fields = fields[names.index(first):names.index(last) + 1]
+            if not fields:
+                raise ValueError(f"empty member range: {first}..{last}")
+            base = fields[0].offset
+            for f in fields:
+                f.offset -= base
+            loc_expr = loc_expr[:-1] + f"+{base}*"
+        return loc_expr, fields
+
+    def find_struct_fields(
+        self, t: dwarf_debug_info.Type
+    ) -> [dwarf_debug_info.Field]:
+        fields = []
+        for m in t.members:
+            mt = dwarf_debug_info.find_type(self.dwarf_filename, m.type_addr)
+            while mt.is_typedef():
+                mt = dwarf_debug_info.find_type(
+                    self.dwarf_filename, mt.type_addr
+                )
+            field = dwarf_debug_info.Field(m.name, m.offset, mt.byte_size, "")
+            if mt.is_structure():
+                field.kind = "struct"
+                field.fields = self.find_struct_fields(mt)
+            elif mt.is_pointer():
+                field.kind, field.size = "pointer", 8
+            elif mt.tag == "DW_TAG_base_type":
+                field.kind = {
+                    "signed": "int",
+                    "unsigned": "uint",
+                    "float": "float",
+                    "boolean": "bool",
+                }.get(mt.encoding, "bytes")
+            else:  # arrays, complex numbers
+                field.kind = "bytes"
+            if not field.size:
+                raise ValueError(f"unknown size of member: {m.name}")
+            fields.append(field)
+        return fields
@@ -1,6 +1,8 @@
 from .utils import yield_elf_lines
+from .. import timings
 
 
+@timings.timed
 def findall_addresses(dwarf_filename: str, function_name: str) -> [(str, str)]:
     addresses = []
     function_name = function_name.encode()
@@ -1,25 +1,37 @@
 import subprocess
 
+from .. import timings
+
 _cache: {(str, str): [bytes]} = {}
 
 
 def yield_elf_lines(dwarf_filename: str, flags: str):
     if (lines := _cache.get((dwarf_filename, flags))):
-        return lines
-
-    _cache[(dwarf_filename, flags)] = lines = []
-    proc = subprocess.Popen(
-        ["objdump", f"-{flags}", dwarf_filename], stdout=subprocess.PIPE
-    )
-    while True:
-        line = proc.stdout.readline()
-        if not line:
-            break
-        lines.append(line.strip())
-    proc.wait()
-    if proc.returncode != 0:
-        raise subprocess.CalledProcessError(
-            proc.returncode, " ".join(proc.args)
+        timings.count(cache_hits=1)
+        return timings.scanned(lines)
+
+    with timings.phase(f"objdump -{flags}"):
+        lines = []
+        proc = subprocess.Popen(
+            ["objdump", f"-{flags}", dwarf_filename], stdout=subprocess.PIPE
         )
+        while True:
+            line = proc.stdout.readline()
+            if not line:
+                break
+            lines.append(line.strip())
+        proc.wait()
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(
+                proc.returncode, " ".join(proc.args)
+            )
+        timings.count(lines=len(lines))
+        _cache[(dwarf_filename, flags)] = lines
+
+    return timings.scanned(lines)
+
 
-    return lines
+def evict(dwarf_filename: str):
+    for key in list(_cache):
+        if key[0] == dwarf_filename:
+            _cache.pop(key, None)
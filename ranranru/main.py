@@ -1,9 +1,11 @@
+import sys
 import click
 from black import format_str, FileMode
 
 from . import bcc
 from . import elf
 from . import program
+from . import timings
 
 
 def handle_program_text(ctx, param, value) -> str:
@@ -47,24 +49,82 @@ def handle_extra_vars(ctx, param, value) -> dict:
     default="",
     callback=handle_program_text,
 )
+@click.option(
+    "--timings",
+    "timings_output",
+    is_flag=False,
+    flag_value="-",
+    default=None,
+    help="record per-phase timings, print a summary with bare --timings or write json with --timings=FILE",  # noqa
+)
 def main(
     ctx,
     target: str,
     program_text: str,
     extra_vars: dict[str, str],
     output: str,
+    timings_output: str,
 ):
     if ctx.invoked_subcommand is not None:
         return
 
-    extra_vars.setdefault("real_target", target)
-    trace_uprobes = program.parse(program_text)
-    elf_interpreter = elf.Interpreter(target)
-    print(
-        format_str(
-            bcc.render(trace_uprobes, elf_interpreter, extra_vars),
-            mode=FileMode(),
-        ),
-        file=open(output, "w"),
-    )
+    with timings.record() as t:
+        extra_vars.setdefault("real_target", target)
+        trace_uprobes = program.parse(program_text)
+        elf_interpreter = elf.Interpreter(target)
+        with timings.phase("render"):
+            text = bcc.render(trace_uprobes, elf_interpreter, extra_vars)
+        with timings.phase("black"):
+            text = format_str(text, mode=FileMode())
+    print(text, file=open(output, "w"))
     print(f"generated {output}")
+    if timings_output:
+        timings.report(t, timings_output)
+
+
+@main.command()
+@click.option(
+    "-s",
+    "--socket",
+    "socket_path",
+    help="unix socket to listen on, read requests from stdin if omitted",
+)
+@click.option(
+    "-t",
+    "--target",
+    "preload",
+    multiple=True,
+    help="golang binary to load on startup, can be repeated",
+)
+@click.option(
+    "--max-binaries",
+    default=4,
+    show_default=True,
+    help="number of warm binaries to keep",
+)
+@click.option(
+    "--workers",
+    default=4,
+    show_default=True,
+    help="number of requests handled concurrently",
+)
+def serve(socket_path: str, preload: [str], max_binaries: int, workers: int):
+    """Render bcc scripts on demand, keeping binaries warm.
+
+    Each request is a json line, e.g.
+    {"id": 1, "target": "./main", "program": "...", "extra_vars": {}},
+    and each response is a json line carrying "script" or "error".
+    """
+    from . import server
+
+    server.serve(socket_path, preload, max_binaries, workers)
+
+
+@main.command()
+@click.argument("filename")
+def decode(filename: str):
+    """Replay a capture file through its script blocks."""
+    from . import capture
+
+    n = capture.decode(filename)
+    print(f"decoded {n} events", file=sys.stderr)
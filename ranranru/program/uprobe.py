@@ -30,6 +30,35 @@ class StackDefine(Define):
     pass
 
 
+@dataclasses.dataclass
+class GuardDefine(Define):
+    arg: int = None
+
+    # class var
+    pat_expression = re.compile(r"^\$\w+\((\d+)\)$")  # $sample(100)
+
+    def __post_init__(self):
+        match = self.pat_expression.match(self.express)
+        if not match or not int(match.group(1)):
+            raise ValueError(f"invalid guard expression: {self.express}")
+        self.arg = int(match.group(1))
+
+
+@dataclasses.dataclass
+class SampleDefine(GuardDefine):
+    pass
+
+
+@dataclasses.dataclass
+class RateLimitDefine(GuardDefine):
+    pass
+
+
+@dataclasses.dataclass
+class BreakerDefine(GuardDefine):
+    pass
+
+
 @dataclasses.dataclass
 class PeekDefine(Define):
     operations: str = None
@@ -79,7 +108,132 @@ class PeekDefine(Define):
         )
 
 
-def new_define(
+@dataclasses.dataclass
+class GatherDefine(PeekDefine):
+    # class var
+    pat_slice = re.compile(r"^(.+?)\[(\d+):(\d+)\]\.?(.*)$")  # a.b[0:8].c
+    max_elems = 64
+
+    def __post_init__(self):
+        super().__post_init__()
+        cast = self.pat_cast.search(self.operations)
+        match = cast and self.pat_slice.match(
+            self.operations.removesuffix(cast.group(0))
+        )
+        if not match:
+            raise ValueError(f"invalid gather expression: {self.express}")
+        lo, hi = int(match.group(2)), int(match.group(3))
+        if not 0 < hi - lo <= self.max_elems:
+            raise ValueError(
+                f"gather range must hold 1 to {self.max_elems} elements: {self.express}"  # noqa
+            )
+
+    @property
+    def slice(self) -> ([str], int, int, [str], str):
+        cast = self.pat_cast.search(self.operations).group(0)
+        head, lo, hi, tail = self.pat_slice.match(
+            self.operations.removesuffix(cast)
+        ).groups()
+        return (
+            head.split("."),
+            int(lo),
+            int(hi),
+            tail.split(".") if tail else [],
+            cast[1:-1],
+        )
+
+    def interpret(
+        self, uprobe_addr: str, dwarf_interpreter
+    ) -> ([str], [str], int, [str], str):  # array, len, size, elem, cast
+        (varname, *members), _, _, elem_members, cast = self.slice
+        array, length, size, elem = dwarf_interpreter.find_slice_location(
+            uprobe_addr, varname, members, elem_members
+        )
+        if cast.startswith("char"):
+            elem += "*"
+        return (
+            self.interpret_cooked(array),
+            self.interpret_cooked(length),
+            size,
+            self.interpret_cooked(elem),
+            cast,
+        )
+
+
+@dataclasses.dataclass
+class StructDefine(PeekDefine):
+    # class var
+    pat_struct = re.compile(
+        r"\(struct(?:\s+(\w+)\.\.(\w+))?\)$"
+    )  # (struct id..name)
+
+    def __post_init__(self):
+        super().__post_init__()
+        if not self.pat_struct.search(self.operations):
+            raise ValueError(f"invalid struct expression: {self.express}")
+
+    def interpret(
+        self, uprobe_addr: str, dwarf_interpreter
+    ) -> ([str], list):  # [sp, +1, *], fields of the struct
+        match = self.pat_struct.search(self.operations)
+        varname, *members = self.operations[:match.start()].split(".")
+        loc_expr, fields = dwarf_interpreter.find_struct_location(
+            uprobe_addr, varname, members, *match.groups()
+        )
+        return self.interpret_cooked(loc_expr), fields
+
+
+@dataclasses.dataclass
+class SpanDefine(Define):
+    name: str = None
+    key: str = None
+    threshold_ns: int = 0
+
+    # class var
+    pat_expression = re.compile(
+        r"^\$\w+\(\s*(\w+)\s*,\s*(.+?)\s*(?:,\s*(\d+)(ns|us|ms|s)\s*)?\)$"
+    )  # $elapsed(req, $tid, 10ms)
+
+    def __post_init__(self):
+        match = self.pat_expression.match(self.express)
+        if not match:
+            raise ValueError(f"invalid span expression: {self.express}")
+        self.name, self.key, n, unit = match.groups()
+        if self.key not in {"$tid", "$goid"} and not self.key.startswith(
+            "$peek("
+        ):
+            raise ValueError(f"invalid span key: {self.key}")
+        if n:
+            self.threshold_ns = int(n) * Address.timer_units[unit]
+
+    def interpret(
+        self, uprobe_addr: str, dwarf_interpreter
+    ) -> [str]:  # like PeekDefine.interpret, nothing for $tid
+        if self.key == "$tid":
+            return []
+        express = self.key
+        if self.key == "$goid":
+            goid = dwarf_interpreter.find_goid_location()
+            express = f"$peek({goid}(int64))"
+        return PeekDefine(self.idx, self.uprobe_idx, "", express).interpret(
+            uprobe_addr, dwarf_interpreter
+        )
+
+
+@dataclasses.dataclass
+class StartDefine(SpanDefine):
+    def __post_init__(self):
+        super().__post_init__()
+        if self.threshold_ns:
+            raise ValueError(f"threshold is for $elapsed: {self.express}")
+
+
+@dataclasses.dataclass
+class ElapsedDefine(SpanDefine):
+    pass
+
+
+def new_define(  # noqa
     idx: int,
     uprobe_idx: int,
     var: str,
@@ -93,10 +247,28 @@ def new_define(
         cls = CommDefine
     elif express == "$stack":
         cls = StackDefine
+    elif express.startswith("$peek") and StructDefine.pat_struct.search(
+        express.strip()[:-1]
+    ):
+        cls = StructDefine
+    elif express.startswith("$peek") and "[" in express:
+        cls = GatherDefine
     elif express.startswith("$peek"):
         cls = PeekDefine
+    elif express.startswith("$sample"):
+        cls = SampleDefine
+    elif express.startswith("$ratelimit"):
+        cls = RateLimitDefine
+    elif express.startswith("$breaker"):
+        cls = BreakerDefine
+    elif express.startswith("$start"):
+        cls = StartDefine
+    elif express.startswith("$elapsed"):
+        cls = ElapsedDefine
     else:
         raise ValueError(f"invalid define expression: {express}")
+    if not var.strip() and not issubclass(cls, (GuardDefine, StartDefine)):
+        raise ValueError(f"variable name required: {express}")
     return cls(idx, uprobe_idx, var.strip(), express.strip())
 
 
@@ -104,14 +276,24 @@ def new_define(
 class Address:
     value: str
 
+    # class var
+    pat_timer = re.compile(r"^every\s+(\d+)(ns|us|ms|s)$")  # every 100ms
+    timer_units = {"ns": 1, "us": 1_000, "ms": 1_000_000, "s": 1_000_000_000}
+
     def __post_init__(self):
         self.value = self.value.strip()
         if not self.type():
             raise ValueError(f"invalid uprobe address: {self.value}")
+        if self.type() == "timer" and not self.timer_ns:
+            raise ValueError(f"timer period must be positive: {self.value}")
 
     def type(self) -> str:
         if self.value.startswith("*"):  # *0x1234
             return "address"
+        elif self.value.startswith("inline:"):  # inline:main.small
+            return "inline"
+        elif self.pat_timer.match(self.value):  # every 100ms
+            return "timer"
         elif re.match(r".+?:\d+$", self.value):  # store/etcdv3/node.go:280
             return "filename_lineno"
         elif (
@@ -130,9 +312,25 @@ class Address:
                 filename,
                 lineno,
             )
+        elif self.type() == "inline":
+            return self.interpret_all(dwarf_interpreter)[0]
         else:
             return dwarf_interpreter.find_address_by_function_name(self.value)
 
+    @property
+    def timer_ns(self) -> int:
+        n, unit = self.pat_timer.match(self.value).groups()
+        return int(n) * self.timer_units[unit]
+
+    def interpret_all(self, dwarf_interpreter) -> [str]:
+        if self.type() == "timer":  # not attached to any address
+            return [""]
+        if self.type() == "inline":
+            return dwarf_interpreter.find_inlined_addresses(
+                self.value.removeprefix("inline:")
+            )
+        return [self.interpret(dwarf_interpreter)]
+
 
 @dataclasses.dataclass
 class Uprobe:
@@ -145,12 +343,30 @@ class Uprobe:
         self.script = self.script.strip()
 
 
+def split_defines(define: str) -> [str]:
+    """Commas within parentheses belong to the define, e.g. $start(a, $tid)"""
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(define):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(define[start:i])
+            start = i + 1
+    parts.append(define[start:])
+    return parts
+
+
 def new(idx: int, address: str, define: str, script: str) -> Uprobe:
     defines: [Define] = []
-    for i, d in enumerate(define.split(",")):
-        if "=" not in d:
+    for i, d in enumerate(split_defines(define)):
+        if "=" in d:
+            var, express = d.split("=", 1)
+        elif d.strip().startswith("$"):  # e.g. $sample(100)
+            var, express = "", d.strip()
+        else:
             continue
-        var, express = d.split("=", 1)
         defines.append(new_define(i, idx, var, express))
     return Uprobe(
         idx=idx,
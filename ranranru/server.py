@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import threading
+import collections
+import socketserver
+import concurrent.futures
+
+from black import format_str, FileMode
+
+from . import bcc
+from . import elf
+from . import program
+
+
+class Binaries:
+    """LRU of warm elf interpreters keyed by binary path and mtime."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.interpreters: {
+            (str, int): elf.Interpreter
+        } = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, target: str) -> elf.Interpreter:
+        path = os.path.realpath(target)
+        key = (path, os.stat(path).st_mtime_ns)
+        with self.lock:
+            if key in self.interpreters:
+                self.interpreters.move_to_end(key)
+                return self.interpreters[key]
+
+            for stale in [k for k in self.interpreters if k[0] == path]:
+                self.interpreters.pop(stale).close()
+            interpreter = self.interpreters[key] = elf.Interpreter(path)
+            while len(self.interpreters) > self.maxsize:
+                _, evicted = self.interpreters.popitem(last=False)
+                evicted.close()
+
+        interpreter.warm()
+        return interpreter
+
+
+class Server:
+    def __init__(self, max_binaries: int, workers: int):
+        self.binaries = Binaries(max_binaries)
+        self.workers = workers
+
+    def render(self, request: dict) -> dict:
+        target = request["target"]
+        extra_vars = dict(request.get("extra_vars") or {})
+        extra_vars.setdefault("real_target", target)
+        uprobes = program.parse(request["program"])
+        text = bcc.render(uprobes, self.binaries.get(target), extra_vars)
+        return {"script": format_str(text, mode=FileMode())}
+
+    def handle(self, line: str) -> str:
+        request = {}
+        try:
+            request = json.loads(line)
+            response = self.render(request)
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        if "id" in request:
+            response["id"] = request["id"]
+        return json.dumps(response)
+
+    def serve_stdin(self):
+        lock = threading.Lock()
+
+        def respond(line: str):
+            response = self.handle(line)
+            with lock:
+                print(response, flush=True)
+
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            for line in sys.stdin:
+                if line.strip():
+                    pool.submit(respond, line)
+
+    def serve_unix(self, path: str):
+        server = self
+        # connections get a thread each, renders share the bounded pool
+        pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = pool.submit(server.handle, line.decode())
+                    self.wfile.write(response.result().encode() + b"\n")
+                    self.wfile.flush()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        with pool, socketserver.ThreadingUnixStreamServer(path, Handler) as s:
+            s.daemon_threads = True
+            try:
+                s.serve_forever()
+            finally:
+                os.unlink(path)
+
+
+def serve(
+    socket_path: str, preload: [str], max_binaries: int, workers: int
+):
+    server = Server(max_binaries, workers)
+    for target in preload:
+        server.binaries.get(target)
+    if socket_path:
+        server.serve_unix(socket_path)
+    else:
+        server.serve_stdin()
@@ -0,0 +1,149 @@
+import sys
+import json
+import time
+import functools
+import contextlib
+import dataclasses
+
+
+@dataclasses.dataclass
+class Phase:
+    scope: str
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    lines: int = 0
+    cache_hits: int = 0
+
+
+class Timings:
+    def __init__(self):
+        self.phases: {(str, str): Phase} = {}
+        self.scopes: [str] = []
+        self.stack: [Phase] = []
+
+    @property
+    def current_scope(self) -> str:
+        return ".".join(self.scopes)
+
+    def get(self, name: str) -> Phase:
+        key = (self.current_scope, name)
+        if key not in self.phases:
+            self.phases[key] = Phase(*key)
+        return self.phases[key]
+
+    @contextlib.contextmanager
+    def scope(self, name: str):
+        self.scopes.append(name)
+        try:
+            yield
+        finally:
+            self.scopes.pop()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        phase = self.get(name)
+        phase.calls += 1
+        self.stack.append(phase)
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.seconds += time.perf_counter() - start
+            self.stack.pop()
+
+    def count(self, lines: int = 0, cache_hits: int = 0):
+        if not self.stack:
+            return
+        self.stack[-1].lines += lines
+        self.stack[-1].cache_hits += cache_hits
+
+    def dump(self) -> dict:
+        return {
+            "phases": [dataclasses.asdict(p) for p in self.phases.values()],
+        }
+
+    def summary(self) -> str:
+        totals: {str: Phase} = {}
+        for p in self.phases.values():
+            total = totals.setdefault(p.name, Phase("", p.name))
+            total.seconds += p.seconds
+            total.calls += p.calls
+            total.lines += p.lines
+            total.cache_hits += p.cache_hits
+
+        r = [
+            f"{'phase':<32}{'seconds':>10}{'calls':>8}{'lines':>12}{'hits':>6}"  # noqa
+        ]
+        for p in sorted(totals.values(), key=lambda p: -p.seconds):
+            r.append(
+                f"{p.name:<32}{p.seconds:>10.4f}{p.calls:>8}{p.lines:>12}{p.cache_hits:>6}"  # noqa
+            )
+        r.append("")
+        r.append(f"{'scope':<32}{'phase':<32}{'seconds':>10}{'lines':>12}")
+        for p in self.phases.values():
+            if p.scope:
+                r.append(
+                    f"{p.scope:<32}{p.name:<32}{p.seconds:>10.4f}{p.lines:>12}"
+                )
+        return "\n".join(r)
+
+
+_current: Timings = None
+
+
+@contextlib.contextmanager
+def record():
+    global _current
+    previous, _current = _current, Timings()
+    try:
+        yield _current
+    finally:
+        _current = previous
+
+
+@contextlib.contextmanager
+def phase(name: str):
+    if _current is None:
+        yield
+        return
+    with _current.phase(name):
+        yield
+
+
+@contextlib.contextmanager
+def scope(name: str):
+    if _current is None:
+        yield
+        return
+    with _current.scope(name):
+        yield
+
+
+def count(lines: int = 0, cache_hits: int = 0):
+    if _current is not None:
+        _current.count(lines, cache_hits)
+
+
+def scanned(lines: [bytes]) -> [bytes]:
+    """Counts the lines handed to the current phase, which scans them"""
+    if _current is not None and _current.stack:
+        _current.stack[-1].lines += len(lines)
+    return lines
+
+
+def timed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with phase(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def report(t: Timings, output: str):
+    if output == "-":
+        print(t.summary(), file=sys.stderr)
+        return
+    with open(output, "w") as f:
+        json.dump(t.dump(), f, indent=2)
@@ -0,0 +1,45 @@
+import struct
+
+import pytest
+
+from ranranru.elf import gopclntab
+
+TEXT = 0x401000
+NAME = b"main.main\0"
+
+
+def build(magic: int) -> bytes:
+    """Header, funcname table and a one-function pcln table, laid out as
+    the linker of each version does"""
+    legacy = magic == 0xFFFFFFFA
+    nwords = 7 if legacy else 8
+    funcname = 8 + nwords * 8
+    pcln = funcname + len(NAME)
+    offsets = [funcname, funcname, funcname, funcname, pcln]  # no files
+    if legacy:
+        words = [1, 0, *offsets]
+        # functab of (pc, funcoff) uintptrs, then _func{entry, nameOff}
+        functab = struct.pack("<QQ", TEXT, 16)
+        func = struct.pack("<Qi", TEXT, 0)
+    else:
+        words = [1, 0, TEXT, *offsets]
+        # functab of (entryOff, funcoff) uint32s, then _func{entryOff, nameOff}
+        functab = struct.pack("<II", 0, 8)
+        func = struct.pack("<Ii", 0, 0)
+    header = struct.pack("<IHBB", magic, 0, 1, 8)
+    header += struct.pack(f"<{nwords}Q", *words)
+    return header + NAME + functab + func
+
+
+@pytest.mark.parametrize("magic", sorted(gopclntab.MAGICS))
+def test_header(magic):
+    table = gopclntab.Table(build(magic), 0, TEXT)
+    assert table.version == gopclntab.MAGICS[magic]
+    assert (table.quantum, table.ptrsize, table.nfunc) == (1, 8, 1)
+    assert table.text_start == TEXT
+    assert [f[:2] for f in table.funcs()] == [(TEXT, "main.main")]
+
+
+def test_unsupported_magic():
+    with pytest.raises(ValueError):
+        gopclntab.Table(build(0xFFFFFFFB), 0, TEXT)